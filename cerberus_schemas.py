@@ -15,7 +15,7 @@ def check_cancer_study_identifier(field, value, error):
         error(field, "The cancer study identifier does not match to that of meta_study.txt.")
         
 def check_duplicate_sample_ids(field, value, error):
-    sample_ids = [x.strip() for x in cases_sequenced['case_list_ids'].split('\t')]
+    sample_ids = [x.strip() for x in value.split('\t')]
     if len(sample_ids) != len(set(sample_ids)):
         error(field, "Duplicate sample IDs in case list.")
 
@@ -211,6 +211,7 @@ META_SCHEMA_MAP = {
                 'gene_panel':
                     {'type': 'string',
                         'required': False},
+                },
     # MetaFileTypes.CNA_LOG2: {
     #     'cancer_study_identifier': True,
     #     'genetic_alteration_type': True,
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Validation of clinical sample and patient attribute files
+"""A clinical data file starts with four '#' lines (display names, descriptions, datatypes and
+priorities of the attributes) before the column header. The header block is parsed once and gives
+the type check of each column, which is then applied to the whole column at once."""
+
+import numpy as np
+import pandas as pd
+import data_reader
+from error_sink import check_records, file_record
+
+HEADER_LINES = ['display names', 'descriptions', 'datatypes', 'priorities']
+DATATYPES = ('STRING', 'NUMBER', 'BOOLEAN')
+
+# Values (in lower case) that mean "not available" in any column
+NA_VALUES = ['[not applicable]', '[not available]', '[pending]', '[discrepancy]', '[completed]', '[null]', '', 'na']
+
+# Columns that identify the rows per clinical file type
+ID_COLUMNS = {
+    'SAMPLE_ATTRIBUTES': ['SAMPLE_ID', 'PATIENT_ID'],
+    'PATIENT_ATTRIBUTES': ['PATIENT_ID'],
+}
+
+
+def parse_header_block(file_path):
+    """Returns the '#' lines before the column header, split into fields, and the column header."""
+    header_block = []
+    with open(file_path, 'r') as file:
+        for line in file:
+            fields = line.rstrip('\r\n').split('\t')
+            if not line.startswith('#'):
+                return header_block, fields
+            fields[0] = fields[0][1:]
+            header_block.append(fields)
+    return header_block, []
+
+def check_header_block(header_block, header):
+    """Returns the errors of the header block and the datatype per column (STRING when unknown)."""
+    errors = []
+    if len(header_block) != len(HEADER_LINES):
+        errors.append(f"ERROR - Expected {len(HEADER_LINES)} header lines ({', '.join(HEADER_LINES)}), found {len(header_block)}.")
+    for line_index, fields in enumerate(header_block):
+        if len(fields) != len(header):
+            errors.append(f"ERROR - Header line {line_index + 1} has {len(fields)} fields, the column header has {len(header)}.")
+
+    datatypes = {column: 'STRING' for column in header}
+    if len(header_block) >= 3:
+        for column, datatype in zip(header, header_block[2]):
+            datatype = datatype.strip().upper()
+            if datatype in DATATYPES:
+                datatypes[column] = datatype
+            else:
+                errors.append(f"ERROR - Invalid datatype '{datatype}' for column {column}, expected one of {', '.join(DATATYPES)}.")
+    if len(header_block) >= 4:
+        for column, priority in zip(header, header_block[3]):
+            if not priority.strip().lstrip('-').isdigit():
+                errors.append(f"ERROR - Invalid priority '{priority}' for column {column}, expected an integer.")
+    return errors, datatypes
+
+def type_check(values, datatype):
+    """Returns a mask of the values that are not of the datatype. Values in NA_VALUES are accepted for every datatype."""
+    lowered = values.str.strip().str.lower()
+    available = values.notna().to_numpy() & ~lowered.isin(NA_VALUES).to_numpy()
+    if datatype == 'NUMBER':
+        return available & pd.to_numeric(values.where(available), errors='coerce').isna().to_numpy()
+    if datatype == 'BOOLEAN':
+        return available & ~lowered.isin(['true', 'false']).to_numpy()
+    return np.zeros(len(values), dtype=bool)
+
+def validate_clinical_dataframe(clinical_df, datatypes, id_columns, data_file=None):
+    """Validates the values of a clinical file. Returns one report record per failed check."""
+    checks = []
+    records = []
+    for column in id_columns:
+        if column not in clinical_df.columns:
+            records.append(file_record(f"ERROR - Missing required column {column}.", data_file=data_file))
+            continue
+        ids = clinical_df[column].str.strip()
+        checks.append((column, f"ERROR - Missing value in {column}.", ids.isna().to_numpy() | (ids == '').to_numpy(), None))
+    # The first ID column identifies the rows (SAMPLE_ID for samples, PATIENT_ID for patients)
+    if id_columns[0] in clinical_df.columns:
+        ids = clinical_df[id_columns[0]].str.strip()
+        checks.append((id_columns[0], f"ERROR - Duplicate {id_columns[0]}.", ids.duplicated(keep=False).to_numpy() & ids.notna().to_numpy(), ids))
+
+    for column in clinical_df.columns:
+        datatype = datatypes.get(column, 'STRING')
+        if datatype != 'STRING':
+            checks.append((column, f"ERROR - Value of column {column} is not a {datatype}.",
+                           type_check(clinical_df[column], datatype), clinical_df[column]))
+    return records + check_records(checks, data_file=data_file)
+
+def validate_clinical_file(file_path, meta_file_type, cache=None):
+    def validate():
+        header_block, header = parse_header_block(file_path)
+        header_errors, datatypes = check_header_block(header_block, header)
+        records = [file_record(error, data_file=file_path) for error in header_errors]
+        # All values are read as strings, the datatypes of the header block decide how they are checked
+        clinical_df = data_reader.read_data_file(file_path, dtype={column: str for column in header})
+        return records + validate_clinical_dataframe(clinical_df, datatypes, ID_COLUMNS[meta_file_type], data_file=file_path)
+
+    if cache is not None:
+        return cache.cached('data', file_path, validate, options=(meta_file_type,))
+    return validate()
+
+def validate_sample_file(file_path, meta_dict=None, cache=None, **kwargs):
+    return validate_clinical_file(file_path, 'SAMPLE_ATTRIBUTES', cache=cache)
+
+def validate_patient_file(file_path, meta_dict=None, cache=None, **kwargs):
+    return validate_clinical_file(file_path, 'PATIENT_ATTRIBUTES', cache=cache)
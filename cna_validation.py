@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Validation of copy number (CNA) gene x sample matrices
+"""CNA matrices have a row per gene (Hugo_Symbol and/or Entrez_Gene_Id) and a column per sample, and
+can be too large to load as a DataFrame. The file is scanned one row at a time; the values of a row are
+parsed into a numpy buffer of fixed width (the number of samples) that is reused for every row, so memory
+use does not grow with the number of genes."""
+
+import numpy as np
+import gene_table
+from error_sink import RowCheckCounter, file_record
+
+GENE_COLUMNS = ['Hugo_Symbol', 'Entrez_Gene_Id']
+NA_TOKENS = ['NA', '']
+
+# Values allowed in discrete CNA data (besides NA)
+DISCRETE_VALUES = np.array([-2, -1.5, -1, 0, 1, 2])
+
+# Whether the values of a matrix are limited to DISCRETE_VALUES, per meta file type
+DISCRETE_TYPES = {
+    'CNA_DISCRETE': True,
+    'CNA_CONTINUOUS': False,
+    'CNA_LOG2': False,
+}
+
+
+def read_matrix_header(file):
+    """Reads the lines up to and including the column header. Returns the gene columns and the sample IDs."""
+    for line in file:
+        if not line.startswith('#'):
+            header = line.rstrip('\r\n').split('\t')
+            gene_columns = [column for column in header if column in GENE_COLUMNS]
+            return gene_columns, header[len(gene_columns):]
+    return [], []
+
+def parse_values(fields, buffer):
+    """Parses the value fields of a row into the buffer (NA as NaN). Returns a mask of the fields that are not numbers."""
+    values = np.asarray(fields)
+    is_na = np.isin(values, NA_TOKENS)
+    try:
+        np.copyto(buffer, np.where(is_na, 'nan', values).astype('float64'))
+        return np.zeros(len(buffer), dtype=bool)
+    except ValueError:
+        # Parse the row value by value, only for the rows with a non-numeric value
+        for position, value in enumerate(fields):
+            try:
+                buffer[position] = float('nan') if is_na[position] else float(value)
+            except ValueError:
+                buffer[position] = np.nan
+        return ~is_na & np.isnan(buffer)
+
+def get_row_gene(gene_columns, gene_fields):
+    """Returns the Hugo symbol and Entrez gene ID of a row (None when missing)."""
+    gene = dict(zip(gene_columns, (field.strip() for field in gene_fields)))
+    hugo_symbol = gene.get('Hugo_Symbol') or None
+    entrez_id = gene.get('Entrez_Gene_Id') or None
+    if hugo_symbol in NA_TOKENS:
+        hugo_symbol = None
+    if entrez_id is not None:
+        entrez_id = int(entrez_id) if entrez_id.lstrip('-').isdigit() else None
+    return hugo_symbol, entrez_id
+
+def check_header_samples(file_path, sample_ids, registry=None):
+    """Checks the sample IDs of a matrix column header. Returns one report record per failed check."""
+    records = []
+    if len(set(sample_ids)) != len(sample_ids):
+        records.append(file_record("ERROR - Duplicate sample IDs in the column header.", data_file=file_path))
+    if registry is not None:
+        unknown_samples = registry.check_sample_ids(sample_ids)['unknown']
+        if unknown_samples:
+            records.append(file_record(f"ERROR - Sample ID(s) in the column header not defined in clinical file: "
+                                       f"{', '.join(unknown_samples[:10])}{' ...' if len(unknown_samples) > 10 else ''}",
+                                       data_file=file_path))
+    return records
+
+def check_row_gene(checks, row, gene_columns, gene_fields, seen_genes, genes=None):
+    """Checks the gene identifiers of a matrix row: present, not seen before and known to the gene table."""
+    hugo_symbol, entrez_id = get_row_gene(gene_columns, gene_fields)
+    gene = entrez_id if entrez_id is not None else hugo_symbol
+    if gene is None:
+        checks.add('Hugo_Symbol', "ERROR - No gene identifier for this row.", row)
+        return
+    if gene in seen_genes:
+        checks.add('Hugo_Symbol', "WARNING - Duplicate gene, the row will not be loaded.", row, gene)
+    seen_genes.add(gene)
+    if genes is not None and not genes.has_gene(hugo_symbol, entrez_id):
+        checks.add('Hugo_Symbol', "WARNING - Gene is not known to the cBioPortal instance.", row, gene)
+
+def validate_matrix(file_path, discrete=False, registry=None, genes=None):
+    """Validates a CNA matrix row by row. Returns one report record per failed check."""
+    checks = RowCheckCounter(data_file=file_path)
+    seen_genes = set()
+    with open(file_path, 'r') as file:
+        gene_columns, sample_ids = read_matrix_header(file)
+        if not gene_columns:
+            return [file_record("ERROR - The matrix needs a Hugo_Symbol and/or Entrez_Gene_Id column.", data_file=file_path)]
+        records = check_header_samples(file_path, sample_ids, registry)
+
+        n_gene_columns = len(gene_columns)
+        width = n_gene_columns + len(sample_ids)
+        buffer = np.empty(len(sample_ids), dtype='float64')
+        for row, line in enumerate(file):
+            fields = line.rstrip('\r\n').split('\t')
+            if len(fields) != width:
+                checks.add(None, f"ERROR - Row has {len(fields)} fields, the header has {width}.", row)
+                continue
+            check_row_gene(checks, row, gene_columns, fields[:n_gene_columns], seen_genes, genes)
+
+            # Failures are reported per sample column
+            not_numbers = parse_values(fields[n_gene_columns:], buffer)
+            for column in np.flatnonzero(not_numbers):
+                checks.add(sample_ids[column], "ERROR - Value is not a number or NA.", row, fields[n_gene_columns + column])
+            if discrete:
+                not_allowed = ~np.isnan(buffer) & ~np.isin(buffer, DISCRETE_VALUES)
+                for column in np.flatnonzero(not_allowed):
+                    checks.add(sample_ids[column], "ERROR - Discrete CNA value is not one of -2, -1.5, -1, 0, 1, 2 or NA.", row,
+                               float(buffer[column]))
+    return records + checks.records()
+
+def validate_cna_file(file_path, meta_dict=None, cache=None, registry=None, meta_file_type='CNA_DISCRETE', **kwargs):
+    def validate():
+        return validate_matrix(file_path, discrete=DISCRETE_TYPES[meta_file_type], registry=registry,
+                               genes=gene_table.get_gene_table())
+
+    if cache is not None:
+        # The result also depends on the clinical file the registry was read from
+        depends_on = (registry.file_path,) if registry is not None else ()
+        return cache.cached('data', file_path, validate, depends_on=depends_on, options=(meta_file_type,))
+    return validate()
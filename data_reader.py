@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Reader for tab-separated data files that only reads the columns the schemas refer to
+"""Data files such as the MAF have 100+ columns, of which the schemas look at about 30. The reader
+takes the set of referenced columns and reads only those, with the given dtype per column, using
+the multithreaded CSV reader of pyarrow when it is installed and pandas otherwise.
+Comment lines (e.g. #genome_nexus_version) before the header are skipped by both readers; a '#' after the
+header is data. Both readers recognize the same missing value tokens (NULL_VALUES), so a file is read into
+the same frame whether pyarrow is installed or not."""
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = None
+
+# pyarrow types for the dtypes of the read dtype maps (other columns are inferred)
+ARROW_TYPES = {
+    str: 'string',
+    'object': 'string',
+    'float64': 'float64',
+}
+
+# Values that are read as missing, the default tokens of pandas (pyarrow's defaults leave out e.g. 'None' and '<NA>')
+NULL_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA',
+               'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+
+def referenced_columns(*schemas, extra_columns=()):
+    """Returns the names of the columns referenced by Pandera schemas and/or Pydantic models,
+    plus extra columns (e.g. columns whose presence is checked by a table-wide check)."""
+    columns = []
+    for schema in schemas:
+        names = schema.columns if hasattr(schema, 'columns') else schema.__fields__
+        columns.extend(names)
+    columns.extend(extra_columns)
+    return list(dict.fromkeys(columns))
+
+def read_header(file_path):
+    """Returns the number of comment lines before the header and the column names of the header."""
+    comment_lines = 0
+    with open(file_path, 'r') as file:
+        for line in file:
+            if not line.startswith('#'):
+                return comment_lines, line.rstrip('\r\n').split('\t')
+            comment_lines += 1
+    return comment_lines, []
+
+def read_data_file(file_path, columns=None, dtype=None):
+    """Reads a tab-separated data file. When columns are given, only the columns of the file that are
+    among them are read; dtype maps column names to the dtype to read them with."""
+    dtype = dtype or {}
+    comment_lines, header = read_header(file_path)
+    if pa is None:
+        usecols = (lambda column: column in columns) if columns is not None else None
+        return pd.read_csv(file_path, sep='\t', skiprows=comment_lines, header=0, usecols=usecols, dtype=dtype,
+                           keep_default_na=False, na_values=NULL_VALUES)
+
+    include_columns = [column for column in header if columns is None or column in columns]
+    column_types = {column: ARROW_TYPES[dtype[column]] for column in include_columns
+                    if dtype.get(column) in ARROW_TYPES}
+    table = pa_csv.read_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(skip_rows=comment_lines, use_threads=True),
+        parse_options=pa_csv.ParseOptions(delimiter='\t'),
+        convert_options=pa_csv.ConvertOptions(include_columns=include_columns,
+                                              column_types=column_types,
+                                              null_values=NULL_VALUES,
+                                              strings_can_be_null=True),
+    )
+    return table.to_pandas()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Streaming sink for the failure cases of the Pandera validation
+import os
+import json
+import numpy as np
+import pandas as pd
+
+FAILURE_CASE_COLUMNS = ['schema_context', 'column', 'check', 'check_number', 'failure_case', 'index']
+CHECK_KEY = ['column', 'check']
+
+DEFAULT_MAX_EXAMPLES = 100 # Failure cases kept per (column, check)
+MAX_SAMPLES = 5 # Distinct failing values shown per (column, check) in the report
+
+# The severity of a failure is the prefix of its message (e.g. "WARNING - ..."),
+# failures without one (e.g. not_nullable or type errors) are reported as ERROR
+SEVERITIES = ('ERROR', 'WARNING', 'INFO')
+
+def get_severity(message):
+    severity = str(message).split(' - ', 1)[0]
+    return severity if severity in SEVERITIES else 'ERROR'
+
+# Function to add sorted row numbers to a list of [first, last] row ranges,
+# merging the first new range with the last range when they are adjacent
+def add_row_ranges(ranges, rows):
+    if len(rows) == 0:
+        return
+    breaks = np.flatnonzero(np.diff(rows) > 1)
+    starts = np.concatenate(([rows[0]], rows[breaks + 1])).tolist()
+    ends = np.concatenate((rows[breaks], [rows[-1]])).tolist()
+    for start, end in zip(starts, ends):
+        if ranges and start <= ranges[-1][1] + 1:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+
+def format_row_ranges(ranges):
+    return ', '.join(str(first) if first == last else f'{first}-{last}' for first, last in ranges)
+
+def check_record(field, message, mask, values=None, data_file=None, max_samples=MAX_SAMPLES):
+    """Returns the report record of a whole-column check that failed on the rows of the mask, in the
+    format of FailureCaseSink.report, or None when no row failed. Rows are positions in the file."""
+    rows = np.flatnonzero(mask)
+    if len(rows) == 0:
+        return None
+    ranges = []
+    add_row_ranges(ranges, rows)
+    # The sample values are taken from the first failing rows only
+    samples = [] if values is None else pd.Series(np.asarray(values)[rows[:1000]]).drop_duplicates().head(max_samples).tolist()
+    return {
+        'file': data_file,
+        'schema_context': 'Column' if field else 'File',
+        'column': field,
+        'check': message,
+        'severity': get_severity(message),
+        'count': len(rows),
+        'rows': format_row_ranges(ranges),
+        'samples': samples,
+    }
+
+def file_record(message, data_file=None, column=None):
+    """Returns the report record of a check on the file as a whole (e.g. its header), which has no rows."""
+    return {
+        'file': data_file,
+        'schema_context': 'File',
+        'column': column,
+        'check': message,
+        'severity': get_severity(message),
+        'count': 1,
+        'rows': '',
+        'samples': [],
+    }
+
+def check_records(checks, data_file=None):
+    """Returns the report records of the (field, message, mask, values) checks that failed."""
+    records = [check_record(field, message, mask, values, data_file=data_file) for field, message, mask, values in checks]
+    return [record for record in records if record is not None]
+
+
+
+class RowCheckCounter:
+    """Counts the failures of checks that are evaluated one row at a time (e.g. while streaming a
+    matrix file), keeping the failing rows as ranges and a few failing values per check.
+    Returns the same report records as check_record."""
+
+    def __init__(self, data_file=None):
+        self.data_file = data_file
+        self.groups = {}
+
+    def add(self, field, message, row, value=None, count=1):
+        """Adds count failures of the check on a row; rows are added in increasing order."""
+        group = self.groups.setdefault((field, message), {'count': 0, 'ranges': [], 'samples': []})
+        group['count'] += count
+        ranges = group['ranges']
+        if ranges and row <= ranges[-1][1] + 1:
+            ranges[-1][1] = max(ranges[-1][1], row)
+        else:
+            ranges.append([row, row])
+        if value is not None and len(group['samples']) < MAX_SAMPLES and value not in group['samples']:
+            group['samples'].append(value)
+
+    def add_mask(self, field, message, mask, values=None, offset=0):
+        """Adds the failures of a whole-column check on a chunk of rows starting at row offset;
+        chunks are added in increasing order."""
+        rows = np.flatnonzero(mask)
+        if len(rows) == 0:
+            return
+        self.add_rows(field, message, rows + offset, None if values is None else np.asarray(values)[rows[:1000]])
+
+    def add_rows(self, field, message, rows, values=None, count=None):
+        """Adds the failures of a check on the given sorted rows, with the failing values to take samples from.
+        Rows are added in increasing order; count is the number of failures when it is not one per row."""
+        group = self.groups.setdefault((field, message), {'count': 0, 'ranges': [], 'samples': []})
+        group['count'] += len(rows) if count is None else count
+        add_row_ranges(group['ranges'], rows)
+        if values is not None and len(group['samples']) < MAX_SAMPLES:
+            # Missing values are kept as None, which (unlike NaN) is valid JSON
+            samples = pd.Series(values).head(1000).drop_duplicates().astype(object)
+            new_samples = [value for value in samples.where(samples.notna(), None).tolist() if value not in group['samples']]
+            group['samples'].extend(new_samples[:MAX_SAMPLES - len(group['samples'])])
+
+    def count(self, field, message):
+        return self.groups.get((field, message), {}).get('count', 0)
+
+    def records(self):
+        return [{
+            'file': self.data_file,
+            'schema_context': 'Column' if field else 'File',
+            'column': field,
+            'check': message,
+            'severity': get_severity(message),
+            'count': group['count'],
+            'rows': format_row_ranges(group['ranges']),
+            'samples': group['samples'],
+        } for (field, message), group in self.groups.items()]
+
+class FailureCaseSink:
+    """Writes failure cases to a TSV file as they are produced (e.g. per chunk of rows), instead of
+    collecting, sorting and writing them all at the end. At most max_examples failure cases are kept
+    (written and returned) per (column, check), but the failure cases of every check are counted exactly.
+
+    The failure cases are grouped per check with a RowCheckCounter, so the report has the same records
+    as the other data validators. When the sink is closed, the records are written next to the failure
+    cases file as a report, one JSON record per check (failure_report.jsonl) and as a readable summary
+    (failure_summary.txt)."""
+
+    def __init__(self, file_path, max_examples=DEFAULT_MAX_EXAMPLES, extra_columns=(), data_file=None):
+        self.file_path = file_path
+        self.report_path = file_path.replace('failure_cases.txt', 'failure_report.jsonl')
+        self.summary_path = file_path.replace('failure_cases.txt', 'failure_summary.txt')
+        self.max_examples = max_examples
+        self.columns = FAILURE_CASE_COLUMNS + list(extra_columns)
+        self.data_file = data_file
+        self.checks = RowCheckCounter(data_file=data_file) # Count, row ranges and sample values per check
+        self.examples = []
+        self.file = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.file_path) or '.', exist_ok=True)
+        self.file = open(self.file_path, 'w')
+        self.file.write('\t'.join(self.columns) + '\n')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.close()
+        self.write_report()
+
+    def add(self, failure_cases):
+        """Counts the failure cases and writes the ones that are within the cap of their check."""
+        failure_cases = failure_cases.reindex(columns=self.columns)
+        kept = []
+        for (column, check), check_cases in failure_cases.groupby(CHECK_KEY, dropna=False, sort=True):
+            # Failures of the table-wide checks have no column
+            column = None if pd.isna(column) else column
+            seen = self.checks.count(column, check)
+            if seen < self.max_examples:
+                kept.append(check_cases.iloc[:self.max_examples - seen])
+            rows = np.sort(pd.to_numeric(check_cases['index'], errors='coerce').dropna().to_numpy(dtype='int64'))
+            self.checks.add_rows(column, check, rows, check_cases['failure_case'], count=len(check_cases))
+        if not kept:
+            return
+        kept = pd.concat(kept).sort_values(by=CHECK_KEY + ['index'], kind='stable')
+        kept.to_csv(self.file, sep='\t', header=False, index=False)
+        # Keep the examples in a JSON serializable form, so they can be stored in the result cache
+        self.examples.extend(json.loads(kept.to_json(orient='records')))
+
+    def report(self):
+        """Returns one record per (file, column, check, severity) with the number of failures,
+        the failing rows as ranges and a few failing values."""
+        return self.checks.records()
+
+    def write_report(self):
+        write_report_files(self.report(), self.report_path, self.summary_path)
+
+
+def rewrite_report(file_path, records, examples, extra_columns=()):
+    """Writes the failure cases file and the report of a stored result (e.g. from the result cache), as the sink
+    wrote them when the result was produced."""
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    pd.DataFrame(examples, columns=FAILURE_CASE_COLUMNS + list(extra_columns)).to_csv(file_path, sep='\t', index=False)
+    write_report_files(records, file_path.replace('failure_cases.txt', 'failure_report.jsonl'),
+                       file_path.replace('failure_cases.txt', 'failure_summary.txt'))
+
+def write_report_files(records, report_path, summary_path):
+    with open(report_path, 'w') as report_file:
+        for record in records:
+            report_file.write(json.dumps(record, default=str) + '\n')
+    with open(summary_path, 'w') as summary_file:
+        for record in records:
+            rows = f" in rows {record['rows']}" if record['rows'] else ''
+            samples = f" (e.g. {', '.join(map(str, record['samples']))})" if record['samples'] else ''
+            summary_file.write(f"{record['severity']} - {record['file']}: {record['column'] or record['schema_context']}: "
+                               f"{record['check']}: {record['count']} failure(s){rows}{samples}\n")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Validation of continuous mRNA expression and methylation gene x sample matrices
+"""Expression and methylation matrices have the layout of CNA matrices (see cna_validation) but are
+often several GB. The file is read as a stream of row blocks, so it never has to fit in memory. The
+rows of a block follow from a budget of values per block, so wide matrices get blocks of fewer rows. The
+gene columns of a block are checked in file order by the reading process, while the values of the block
+are parsed into float32 arrays, one column block at a time. With more than one job, the row blocks are
+parsed by a pool of worker processes (the parsing holds the GIL, so threads would not run it in parallel)
+and only a few row blocks are in flight at any time."""
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import gene_table
+from cna_validation import NA_TOKENS, check_header_samples, check_row_gene, read_matrix_header
+from error_sink import RowCheckCounter, file_record
+
+BLOCK_CELLS = 1000000 # Values per block handed to a worker, a block has BLOCK_CELLS // samples rows
+COLUMN_BLOCK_SIZE = 2000 # Samples parsed at once within a row block
+
+
+def parse_column_block(values):
+    """Parses a (rows x samples) block of strings into float32 (NA as NaN). Returns the numbers, a mask
+    of the values that are not numbers and a mask of the values that are infinite."""
+    is_na = np.isin(values, NA_TOKENS)
+    try:
+        numbers = np.where(is_na, 'nan', values).astype('float32')
+    except ValueError:
+        # Only blocks with a non-numeric value are parsed by pandas
+        numbers = pd.to_numeric(pd.Series(values.ravel()), errors='coerce').to_numpy(dtype='float32').reshape(values.shape)
+    infinities = np.isinf(numbers)
+    if infinities.any():
+        # Values above the float32 range (about 3.4e38) become inf as well, only values that are inf as float64 are infinite
+        infinities[infinities] = np.isinf(pd.to_numeric(pd.Series(values[infinities])).to_numpy(dtype='float64'))
+    return numbers, ~is_na & np.isnan(numbers), infinities
+
+def get_block_rows(n_samples):
+    """Returns the number of rows per block of a matrix with n_samples sample columns."""
+    return max(1, BLOCK_CELLS // max(1, n_samples))
+
+def check_row_block(first_row, lines, n_gene_columns, width):
+    """Checks the values of a block of lines. Rows with a wrong number of fields (reported by the reading
+    process) are checked as NA. Returns (sample column, message, rows, values) per failing column and check,
+    with the first failing values of the column."""
+    n_samples = width - n_gene_columns
+    value_rows = []
+    for line in lines:
+        fields = line.rstrip('\r\n').split('\t')
+        value_rows.append(fields[n_gene_columns:] if len(fields) == width else [''] * n_samples)
+
+    failures = []
+    for start in range(0, n_samples, COLUMN_BLOCK_SIZE):
+        # Only one column block at a time is held as a fixed-width string array
+        values = np.array([fields[start:start + COLUMN_BLOCK_SIZE] for fields in value_rows], dtype=str).reshape(len(lines), -1)
+        _, not_numbers, infinities = parse_column_block(values)
+        for message, mask in (("ERROR - Value is not a number or NA.", not_numbers),
+                              ("ERROR - Value is infinite.", infinities)):
+            for column in np.flatnonzero(mask.any(axis=0)):
+                rows = np.flatnonzero(mask[:, column])
+                failures.append((start + int(column), message, first_row + rows, values[rows[:1000], column].tolist()))
+    return failures
+
+def validate_expression_matrix(file_path, registry=None, genes=None, jobs=None):
+    """Validates an expression or methylation matrix in row blocks, parsed in jobs worker processes when
+    jobs is more than one. Returns one report record per failed check."""
+    checks = RowCheckCounter(data_file=file_path)
+    seen_genes = set()
+    jobs = jobs or 1
+    pending = []
+
+    def add_failures(failures):
+        for column, message, rows, values in failures:
+            checks.add_rows(sample_ids[column], message, rows, values)
+
+    with open(file_path, 'r') as file:
+        gene_columns, sample_ids = read_matrix_header(file)
+        if not gene_columns:
+            return [file_record("ERROR - The matrix needs a Hugo_Symbol and/or Entrez_Gene_Id column.", data_file=file_path)]
+        records = check_header_samples(file_path, sample_ids, registry)
+
+        n_gene_columns = len(gene_columns)
+        width = n_gene_columns + len(sample_ids)
+        block_rows = get_block_rows(len(sample_ids))
+        executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+
+        def check_block(first_row, lines):
+            if executor is None:
+                add_failures(check_row_block(first_row, lines, n_gene_columns, width))
+                return
+            # The lines are sent as read, the workers split them
+            pending.append(executor.submit(check_row_block, first_row, lines, n_gene_columns, width))
+            # Failures are added in file order, and at most two blocks per worker are kept in memory
+            if len(pending) > 2 * jobs:
+                add_failures(pending.pop(0).result())
+
+        try:
+            first_row, lines = 0, []
+            for row, line in enumerate(file):
+                # Only the gene columns are split off here, the values are split by check_row_block
+                n_fields = line.count('\t') + 1
+                if n_fields != width:
+                    checks.add(None, f"ERROR - Row has {n_fields} fields, the header has {width}.", row)
+                else:
+                    check_row_gene(checks, row, gene_columns, line.rstrip('\r\n').split('\t', n_gene_columns)[:n_gene_columns],
+                                   seen_genes, genes)
+                if not lines:
+                    first_row = row
+                lines.append(line)
+                if len(lines) == block_rows:
+                    check_block(first_row, lines)
+                    lines = []
+            if lines:
+                check_block(first_row, lines)
+            for future in pending:
+                add_failures(future.result())
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+    return records + checks.records()
+
+def validate_expression_file(file_path, meta_dict=None, cache=None, registry=None, jobs=None, **kwargs):
+    def validate():
+        return validate_expression_matrix(file_path, registry=registry, genes=gene_table.get_gene_table(), jobs=jobs)
+
+    if cache is not None:
+        # The result also depends on the clinical file the registry was read from
+        depends_on = (registry.file_path,) if registry is not None else ()
+        return cache.cached('data', file_path, validate, depends_on=depends_on)
+    return validate()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Validation of the gene panel matrix and of the panel coverage of the mutation data
+"""The gene panel matrix assigns a gene panel to each sample per genetic profile (e.g. the
+'mutations' column). Each panel is defined by a gene panel file with its stable_id and gene_list.
+
+Panel genes and mutations can name a gene by Hugo symbol, alias or Entrez gene ID, so both are
+resolved to Entrez gene IDs through the gene table. The genes of all panels are put in one index of
+Entrez gene IDs, and each panel becomes a row of bits over that index (np.packbits), so dozens of
+panels take a few KB. The coverage of the mutations is then checked for all MAF rows at once: the
+panel of the sample and the position of the gene in the index are looked up per row, and the bit of
+the gene is gathered from the bitset of the panel."""
+
+import os
+import numpy as np
+import pandas as pd
+import data_reader
+import gene_table
+import validateMeta
+from error_sink import check_records, file_record
+
+# Directories with gene panel files, besides the gene_panels directory of the study
+PANEL_DIRS = [panel_dir for panel_dir in os.environ.get('GENE_PANEL_DIR', '').split(os.pathsep) if panel_dir]
+
+# Column of the panel matrix that gives the panel of the samples of the mutation data
+MUTATION_PROFILE = 'mutations'
+MAF_COLUMNS = ['Tumor_Sample_Barcode', 'Hugo_Symbol', 'Entrez_Gene_Id']
+
+
+def resolve_panel_genes(panel_genes, genes=None):
+    """Returns the Entrez gene IDs of panel genes (upper case Hugo symbols, aliases or Entrez gene IDs),
+    NaN for unknown genes. Without a gene table only the Entrez gene IDs are resolved."""
+    panel_genes = pd.Series(panel_genes, dtype=object)
+    is_entrez_id = panel_genes.str.fullmatch(r'\d+').fillna(False).to_numpy(dtype=bool)
+    entrez_ids = pd.to_numeric(panel_genes.where(is_entrez_id), errors='coerce').to_numpy(dtype='float64')
+    if genes is None:
+        return entrez_ids
+    return genes.gene_entrez_ids(panel_genes.where(~is_entrez_id), entrez_ids)
+
+class GenePanels:
+    """Gene sets of the gene panels as bitsets over one index of the Entrez gene IDs of their genes."""
+
+    def __init__(self, panel_genes, genes=None):
+        self.panel_ids = pd.Index(list(panel_genes))
+        # The panel genes as listed, and their Entrez gene IDs (NaN for unknown genes)
+        self.gene_index = pd.Index(sorted({gene for panel in panel_genes.values() for gene in panel}))
+        self.gene_entrez_ids = resolve_panel_genes(self.gene_index, genes)
+        known = ~np.isnan(self.gene_entrez_ids)
+        self.entrez_index = pd.Index(np.unique(self.gene_entrez_ids[known]).astype('int64'))
+        gene_codes = np.full(len(self.gene_index), -1)
+        gene_codes[known] = self.entrez_index.get_indexer(self.gene_entrez_ids[known].astype('int64'))
+        members = np.zeros((len(self.panel_ids), len(self.entrez_index)), dtype=bool)
+        for position, panel in enumerate(panel_genes.values()):
+            codes = gene_codes[self.gene_index.get_indexer(list(panel))]
+            members[position, codes[codes >= 0]] = True
+        self.bits = np.packbits(members, axis=1)
+
+    @classmethod
+    def from_panel_files(cls, panel_paths, genes=None):
+        panel_genes = {}
+        for panel_path in panel_paths:
+            meta_dict, _ = validateMeta.get_parsed_meta(panel_path)
+            if 'stable_id' not in meta_dict:
+                raise Exception(f"No stable_id found in gene panel file {panel_path}.")
+            gene_list = meta_dict.get('gene_list', '').split('\t')
+            panel_genes[meta_dict['stable_id']] = {gene.strip().upper() for gene in gene_list if gene.strip()}
+        return cls(panel_genes, genes)
+
+    def covers(self, panel_ids, entrez_ids):
+        """Returns a mask of the (panel, gene) pairs where the gene, given by Entrez gene ID (NaN when unknown),
+        is in the panel. Unknown panels cover no genes."""
+        panel_codes = self.panel_ids.get_indexer(panel_ids)
+        entrez_ids = np.asarray(entrez_ids, dtype='float64')
+        known = ~np.isnan(entrez_ids)
+        gene_codes = np.full(len(entrez_ids), -1)
+        gene_codes[known] = self.entrez_index.get_indexer(entrez_ids[known].astype('int64'))
+        known = (panel_codes >= 0) & (gene_codes >= 0)
+        covered = np.zeros(len(panel_codes), dtype=bool)
+        panel_codes, gene_codes = panel_codes[known], gene_codes[known]
+        # packbits puts the first gene in the highest bit of a byte
+        covered[known] = ((self.bits[panel_codes, gene_codes >> 3] >> (7 - (gene_codes & 7))) & 1) == 1
+        return covered
+
+
+def get_panel_dirs(study_dir):
+    return [os.path.join(study_dir, 'gene_panels')] + PANEL_DIRS
+
+def find_panel_files(study_dir):
+    panel_paths = []
+    for panel_dir in get_panel_dirs(study_dir):
+        if os.path.isdir(panel_dir):
+            panel_paths.extend(os.path.join(panel_dir, entry) for entry in sorted(os.listdir(panel_dir)) if not entry.startswith('.'))
+    return panel_paths
+
+def validate_panel_matrix(matrix_df, panels, registry=None, data_file=None):
+    """Validates the samples and panel IDs of the gene panel matrix. Returns one report record per failed check."""
+    if 'SAMPLE_ID' not in matrix_df.columns:
+        return [file_record("ERROR - Missing required column SAMPLE_ID in gene panel matrix.", data_file=data_file)]
+    sample_ids = matrix_df['SAMPLE_ID'].str.strip()
+    checks = [
+        ('SAMPLE_ID', "ERROR - Missing sample ID.", sample_ids.isna().to_numpy(), None),
+        ('SAMPLE_ID', "ERROR - Duplicate SAMPLE_ID.", sample_ids.duplicated(keep=False).to_numpy() & sample_ids.notna().to_numpy(), sample_ids),
+    ]
+    if registry is not None:
+        checks.append(('SAMPLE_ID', "ERROR - Sample ID not defined in clinical file.",
+                       sample_ids.notna().to_numpy() & ~sample_ids.isin(registry.sample_ids).to_numpy(), sample_ids))
+    for column in matrix_df.columns.drop('SAMPLE_ID'):
+        panel_ids = matrix_df[column].str.strip()
+        # NA means that the profile of the sample was not measured with a gene panel (e.g. whole exome)
+        defined = panel_ids.isna().to_numpy() | (panel_ids == 'NA').to_numpy() | panel_ids.isin(panels.panel_ids).to_numpy()
+        checks.append((column, "ERROR - Gene panel is not defined in a gene panel file.", ~defined, panel_ids))
+    return check_records(checks, data_file=data_file)
+
+def validate_panel_genes(panels, data_file=None):
+    """Checks that the genes of the gene panels are known to the gene table the panels were resolved with."""
+    unknown = panels.gene_index[np.isnan(panels.gene_entrez_ids)]
+    if len(unknown) == 0:
+        return []
+    return [file_record(f"WARNING - Gene(s) of the gene panels not known to the cBioPortal instance: "
+                        f"{', '.join(unknown[:10])}{' ...' if len(unknown) > 10 else ''}", data_file=data_file)]
+
+def check_mutation_coverage(maf_df, sample_panels, panels, genes, data_file=None):
+    """Checks that the gene of each mutation is in the gene panel of its sample. Mutations of samples
+    without a panel (missing from the matrix or NA) and mutations without a known gene (reported by
+    the mutation validator) are not checked."""
+    gene_columns = [column for column in MAF_COLUMNS[1:] if column in maf_df.columns]
+    if 'Tumor_Sample_Barcode' not in maf_df.columns or not gene_columns:
+        # Missing MAF columns are reported by the mutation validator
+        return []
+    missing = pd.Series(None, index=maf_df.index, dtype=object)
+    hugo_symbols = maf_df['Hugo_Symbol'].str.strip() if 'Hugo_Symbol' in maf_df.columns else missing
+    entrez_ids = pd.to_numeric(maf_df.get('Entrez_Gene_Id', missing), errors='coerce')
+    # 0 is a missing Entrez_Gene_Id in MAF files
+    row_genes = genes.gene_entrez_ids(hugo_symbols, entrez_ids.where(entrez_ids != 0))
+
+    row_panels = maf_df['Tumor_Sample_Barcode'].str.strip().map(sample_panels)
+    has_panel = row_panels.notna().to_numpy() & row_panels.isin(panels.panel_ids).to_numpy()
+    covered = panels.covers(row_panels, row_genes)
+    return check_records([(gene_columns[0], "WARNING - Gene is not in the gene panel of the sample.",
+                           has_panel & ~np.isnan(row_genes) & ~covered, maf_df[gene_columns[0]])], data_file=data_file)
+
+def validate_gene_panel_file(file_path, meta_dict=None, cache=None, registry=None, study_meta=None, **kwargs):
+    """Validates the gene panel matrix and, when the study has mutation data, the panel coverage of the mutations."""
+    study_dir = os.path.dirname(file_path)
+    panel_paths = find_panel_files(study_dir)
+    maf_paths = []
+    for mutation_meta_path in validateMeta.get_meta_paths(study_meta or {}, 'MUTATION'):
+        mutation_meta, _ = validateMeta.get_parsed_meta(mutation_meta_path)
+        maf_paths.append(os.path.join(study_dir, mutation_meta['data_filename']))
+
+    def validate():
+        genes = gene_table.get_gene_table()
+        panels = GenePanels.from_panel_files(panel_paths, genes)
+        _, header = data_reader.read_header(file_path)
+        matrix_df = data_reader.read_data_file(file_path, dtype={column: str for column in header})
+        records = validate_panel_matrix(matrix_df, panels, registry=registry, data_file=file_path)
+        records += validate_panel_genes(panels, data_file=file_path)
+        if maf_paths and {'SAMPLE_ID', MUTATION_PROFILE} <= set(matrix_df.columns):
+            sample_panels = matrix_df.assign(SAMPLE_ID=matrix_df['SAMPLE_ID'].str.strip()).drop_duplicates('SAMPLE_ID')
+            sample_panels = sample_panels.set_index('SAMPLE_ID')[MUTATION_PROFILE].str.strip()
+            for maf_path in maf_paths:
+                maf_df = data_reader.read_data_file(maf_path, columns=set(MAF_COLUMNS), dtype={column: str for column in MAF_COLUMNS})
+                records += check_mutation_coverage(maf_df, sample_panels, panels, genes, data_file=maf_path)
+        return records
+
+    if cache is not None:
+        # The result also depends on the panel files, the mutation data and the clinical file of the registry
+        depends_on = tuple(panel_paths) + tuple(maf_paths) + ((registry.file_path,) if registry is not None else ())
+        return cache.cached('data', file_path, validate, depends_on=depends_on)
+    return validate()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Local, versioned snapshot of the cBioPortal gene table
+"""The gene table (Hugo symbol, Entrez gene ID and aliases) is stored as a directory of .npy arrays
+per version, e.g. gene_reference/2026-10-17/. The arrays are memory-mapped when the table is first
+used, so worker processes share the pages of one snapshot instead of each fetching the table.
+The snapshot also holds the sort order of each looked up array, so values (a single one, or a whole
+column at once) are looked up with a binary search (np.searchsorted) on the memory-mapped arrays,
+without building indexes in memory.
+
+Build a snapshot from the cBioPortal API with:
+    python3 gene_table.py -o gene_reference/ [-v VERSION]"""
+
+import os
+import json
+import argparse
+import logging
+import datetime
+import numpy as np
+import pandas as pd
+import requests
+
+GENES_URL = 'http://cbioportal.org/api/genes'
+ALIASES_URL = 'http://cbioportal.org/api/genes/{}/aliases'
+
+SNAPSHOT_ROOT = os.environ.get('GENE_REFERENCE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gene_reference'))
+# Version of the snapshot to use, by default the latest version in the snapshot directory
+SNAPSHOT_VERSION = os.environ.get('GENE_REFERENCE_VERSION')
+
+ARRAYS = ['hugo_symbols', 'entrez_ids', 'alias_symbols', 'alias_entrez_ids']
+# Stable sort order per looked up array, so the first row of a value is found first
+SORT_ORDERS = {'hugo_symbols': 'symbol_order', 'entrez_ids': 'entrez_order', 'alias_symbols': 'alias_order'}
+
+
+def to_symbol_array(hugo_symbols):
+    """Returns Hugo symbols (e.g. a Series) as an array of upper case strings, with '' for missing symbols."""
+    hugo_symbols = pd.Series(hugo_symbols, dtype=object)
+    return hugo_symbols.str.upper().where(hugo_symbols.notna(), '').to_numpy(dtype=str)
+
+class GeneTable:
+    """Gene table of one snapshot. The rows keep the order of the genes API."""
+
+    def __init__(self, snapshot_dir):
+        self.snapshot_dir = snapshot_dir
+        with open(os.path.join(snapshot_dir, 'manifest.json'), 'r') as manifest_file:
+            self.manifest = json.load(manifest_file)
+        self.version = self.manifest['version']
+        self._arrays = {}
+
+    def _array(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.snapshot_dir, f'{name}.npy'), mmap_mode='r')
+        return self._arrays[name]
+
+    def _order(self, name):
+        order_name = SORT_ORDERS[name]
+        if order_name not in self._arrays:
+            if os.path.exists(os.path.join(self.snapshot_dir, f'{order_name}.npy')):
+                self._array(order_name)
+            else:
+                # Snapshots written before the sort orders were stored
+                self._arrays[order_name] = np.argsort(self._array(name), kind='stable')
+        return self._arrays[order_name]
+
+    @property
+    def hugo_symbols(self):
+        return self._array('hugo_symbols')
+
+    @property
+    def entrez_ids(self):
+        return self._array('entrez_ids')
+
+    def _find(self, name, values):
+        """Returns the first row of each value (an array of upper case symbols or of Entrez gene IDs) in an array
+        of the table, -1 where the value does not occur, and the (left, right) search positions in the sort order."""
+        array, order = self._array(name), self._order(name)
+        values = np.asarray(values)
+        if array.dtype.kind == 'U':
+            # Values are searched in the width of the array, a longer value does not occur in it
+            fits = np.char.str_len(values) <= array.dtype.itemsize // np.dtype('U1').itemsize
+            queries = np.where(fits, values, '').astype(array.dtype)
+        else:
+            fits = np.ones(len(values), dtype=bool)
+            queries = values.astype(array.dtype)
+        left = np.searchsorted(array, queries, side='left', sorter=order)
+        right = np.searchsorted(array, queries, side='right', sorter=order)
+        found = fits & (right > left)
+        rows = np.full(len(values), -1, dtype='int64')
+        rows[found] = np.asarray(order[left[found]])
+        return rows, left, right
+
+    def symbol_rows(self, hugo_symbols):
+        """Returns the row of the first gene of each Hugo symbol, -1 for unknown (or missing) symbols."""
+        return self._find('hugo_symbols', to_symbol_array(hugo_symbols))[0]
+
+    def has_symbols(self, hugo_symbols):
+        """Column-wise has_symbol, for Hugo symbols in any case."""
+        return self.symbol_rows(hugo_symbols) >= 0
+
+    def has_entrez_ids(self, entrez_ids):
+        """Column-wise has_entrez_id, for an array of integer Entrez gene IDs."""
+        return self._find('entrez_ids', np.asarray(entrez_ids, dtype='int64'))[0] >= 0
+
+    def symbol_entrez_ids(self, hugo_symbols):
+        """Returns the Entrez gene ID of the first gene of each Hugo symbol, NaN for unknown symbols."""
+        rows = self.symbol_rows(hugo_symbols)
+        entrez_ids = np.full(len(rows), np.nan)
+        entrez_ids[rows >= 0] = self.entrez_ids[rows[rows >= 0]]
+        return entrez_ids
+
+    def gene_entrez_ids(self, hugo_symbols, entrez_ids=None):
+        """Returns the Entrez gene ID of the gene of each row, found as has_gene finds it: by the Entrez gene ID
+        when it is given (NaN when missing), otherwise by the Hugo symbol or by an alias of a single gene.
+        NaN where no known gene is found."""
+        symbols = to_symbol_array(hugo_symbols)
+        resolved = self.symbol_entrez_ids(symbols)
+        alias_rows, left, right = self._find('alias_symbols', symbols)
+        # An alias of more than one gene does not identify a gene
+        by_alias = np.isnan(resolved) & (alias_rows >= 0) & (right - left == 1)
+        resolved[by_alias] = self._array('alias_entrez_ids')[alias_rows[by_alias]]
+        if entrez_ids is not None:
+            entrez_ids = np.asarray(entrez_ids, dtype='float64')
+            given = ~np.isnan(entrez_ids)
+            integral = given & (np.mod(np.where(given, entrez_ids, 0), 1) == 0)
+            known = integral & self.has_entrez_ids(np.where(integral, entrez_ids, 0))
+            resolved = np.where(given, np.where(known, entrez_ids, np.nan), resolved)
+        return resolved
+
+    def entrez_id(self, hugo_symbol):
+        """Returns the Entrez gene ID of a (upper case) Hugo symbol, or None when the symbol is unknown."""
+        row = self._find('hugo_symbols', np.array([hugo_symbol], dtype=str))[0][0]
+        return int(self.entrez_ids[row]) if row >= 0 else None
+
+    def hugo_symbol(self, entrez_id):
+        """Returns the Hugo symbol of an Entrez gene ID, or None when the ID is unknown."""
+        row = self._find('entrez_ids', np.array([entrez_id], dtype='int64'))[0][0]
+        return str(self.hugo_symbols[row]) if row >= 0 else None
+
+    def alias_entrez_ids(self, alias):
+        """Returns the Entrez gene IDs of the genes that have the (upper case) alias."""
+        rows, left, right = self._find('alias_symbols', np.array([alias], dtype=str))
+        if rows[0] < 0:
+            return []
+        return [int(self._array('alias_entrez_ids')[row]) for row in self._order('alias_symbols')[left[0]:right[0]]]
+
+    def has_symbol(self, hugo_symbol):
+        return self.entrez_id(hugo_symbol) is not None
+
+    def has_entrez_id(self, entrez_id):
+        return self.hugo_symbol(entrez_id) is not None
+
+    def has_gene(self, hugo_symbol=None, entrez_id=None):
+        """Returns whether a gene given by Hugo symbol (or alias) and/or Entrez gene ID is known.
+        The Entrez gene ID is used when it is given, as in cBioPortal."""
+        if entrez_id is not None:
+            return self.has_entrez_id(entrez_id)
+        if hugo_symbol is not None:
+            hugo_symbol = hugo_symbol.upper()
+            return self.has_symbol(hugo_symbol) or len(self.alias_entrez_ids(hugo_symbol)) > 0
+        return False
+
+    def known_genes(self, hugo_symbols, entrez_ids=None):
+        """Column-wise has_gene: returns a mask of the rows whose gene is known, given a Series of Hugo
+        symbols (or aliases) and optionally an array of Entrez gene IDs (NaN when missing)."""
+        symbols = to_symbol_array(hugo_symbols)
+        known = (self._find('hugo_symbols', symbols)[0] >= 0) | (self._find('alias_symbols', symbols)[0] >= 0)
+        if entrez_ids is not None:
+            entrez_ids = np.asarray(entrez_ids, dtype='float64')
+            given = ~np.isnan(entrez_ids)
+            # An Entrez gene ID that is not an integer is not known
+            integral = given & (np.mod(np.where(given, entrez_ids, 0), 1) == 0)
+            known_entrez_ids = integral & self.has_entrez_ids(np.where(integral, entrez_ids, 0))
+            known = np.where(given, known_entrez_ids, known)
+        return known
+
+
+def latest_version(snapshot_root):
+    versions = sorted(entry for entry in os.listdir(snapshot_root)
+                      if os.path.isfile(os.path.join(snapshot_root, entry, 'manifest.json')))
+    if not versions:
+        raise FileNotFoundError(f"No gene reference snapshot found in {snapshot_root}. "
+                                f"Build one with: python3 gene_table.py -o {snapshot_root}")
+    return versions[-1]
+
+_gene_table = None
+
+def get_gene_table():
+    """Returns the gene table of the configured snapshot, loaded on first use."""
+    global _gene_table
+    if _gene_table is None:
+        if not os.path.isdir(SNAPSHOT_ROOT):
+            raise FileNotFoundError(f"Gene reference directory {SNAPSHOT_ROOT} does not exist. "
+                                    f"Build a snapshot with: python3 gene_table.py -o {SNAPSHOT_ROOT}")
+        version = SNAPSHOT_VERSION or latest_version(SNAPSHOT_ROOT)
+        _gene_table = GeneTable(os.path.join(SNAPSHOT_ROOT, version))
+        logging.info(f'Using gene reference snapshot {_gene_table.version}')
+    return _gene_table
+
+def load_gene_table(snapshot_dir):
+    """Loads the gene table of a snapshot as the gene table of this process, e.g. in a worker process
+    that gets the snapshot of its parent."""
+    global _gene_table
+    _gene_table = GeneTable(snapshot_dir)
+    return _gene_table
+
+def get_snapshot_version():
+    """Returns the version of the configured snapshot without loading it, or None when there is no snapshot."""
+    if _gene_table is not None:
+        return _gene_table.version
+    try:
+        return SNAPSHOT_VERSION or latest_version(SNAPSHOT_ROOT)
+    except FileNotFoundError:
+        return None
+
+def write_snapshot(snapshot_dir, genes, aliases, version, source):
+    """Writes a snapshot from a genes DataFrame (hugoGeneSymbol, entrezGeneId) and
+    an aliases DataFrame (gene_alias, entrezGeneId)."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    arrays = {
+        # Fixed-width arrays, so they can be memory-mapped
+        'hugo_symbols': genes['hugoGeneSymbol'].str.upper().to_numpy(dtype=str),
+        'entrez_ids': genes['entrezGeneId'].to_numpy(dtype='int64'),
+        'alias_symbols': aliases['gene_alias'].str.upper().to_numpy(dtype=str),
+        'alias_entrez_ids': aliases['entrezGeneId'].to_numpy(dtype='int64'),
+    }
+    for name in ARRAYS:
+        np.save(os.path.join(snapshot_dir, f'{name}.npy'), arrays[name])
+    for name, order_name in SORT_ORDERS.items():
+        np.save(os.path.join(snapshot_dir, f'{order_name}.npy'), np.argsort(arrays[name], kind='stable').astype('int64'))
+    manifest = {'version': version, 'source': source, 'genes': len(genes), 'aliases': len(aliases)}
+    with open(os.path.join(snapshot_dir, 'manifest.json'), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+def download_snapshot(snapshot_root, version=None, with_aliases=True):
+    version = version or datetime.date.today().isoformat()
+    genes = pd.read_json(GENES_URL)
+    if with_aliases:
+        # One request per gene, so this takes a while
+        aliases = pd.DataFrame([{'gene_alias': alias, 'entrezGeneId': entrez_id}
+                                for entrez_id in genes['entrezGeneId']
+                                for alias in requests.get(ALIASES_URL.format(entrez_id)).json()])
+    else:
+        aliases = pd.DataFrame({'gene_alias': pd.Series(dtype=str), 'entrezGeneId': pd.Series(dtype='int64')})
+    write_snapshot(os.path.join(snapshot_root, version), genes, aliases, version, GENES_URL)
+    return version
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Downloads a snapshot of the cBioPortal gene table.")
+    parser.add_argument("-o", "--output_dir",
+                        default=SNAPSHOT_ROOT,
+                        help="Directory containing the gene reference snapshots.")
+    parser.add_argument("-v", "--version",
+                        default=None,
+                        help="Version of the snapshot (default: today's date).")
+    parser.add_argument("--no_aliases",
+                        action="store_true",
+                        help="Do not download the gene aliases.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    version = download_snapshot(args.output_dir, version=args.version, with_aliases=not args.no_aliases)
+    logging.info(f'Wrote gene reference snapshot {version} to {args.output_dir}')
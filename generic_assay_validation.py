@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Validation of generic assay entity x sample matrices
+"""A generic assay file has a row per entity (ENTITY_STABLE_ID plus the entity properties listed in
+generic_entity_meta_properties of the meta file) and a column per sample. Files of treatment
+response data can have 10k+ sample columns, so the values are read in chunks of rows and checked
+per chunk. The rows of a chunk follow from a budget of values per chunk (not from the --chunksize
+of the MAF), so wider files get chunks of fewer rows. Only the ENTITY_STABLE_ID column is read for
+the whole file, once, to find duplicate entities. The values of a chunk are checked all at once, e.g. limit values such as '>8.5' are
+parsed with one regex extraction over the values of the chunk."""
+
+import numpy as np
+import pandas as pd
+import data_reader
+from cna_validation import NA_TOKENS, check_header_samples
+from error_sink import RowCheckCounter, check_records, file_record
+
+ENTITY_COLUMN = 'ENTITY_STABLE_ID'
+CHUNK_CELLS = 1000000 # Values per chunk, a chunk has CHUNK_CELLS // samples rows
+
+# Number with an optional limit prefix, e.g. '8.5', '>8.5' or '<=1e-3'
+LIMIT_VALUE_PATTERN = r'^\s*(?P<limit>[<>]=?)?\s*(?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*$'
+BINARY_VALUES = ['true', 'false', 'yes', 'no']
+
+VALUE_TYPES = {
+    'GENERIC_ASSAY_CONTINUOUS': 'LIMIT-VALUE',
+    'GENERIC_ASSAY_BINARY': 'BINARY',
+    'GENERIC_ASSAY_CATEGORICAL': 'CATEGORICAL',
+}
+
+
+def check_values(values, value_type):
+    """Returns (message, mask) per check of a (rows x samples) array of value strings."""
+    available = ~np.isin(values, NA_TOKENS)
+    flat_values = pd.Series(values.ravel())
+    if value_type == 'LIMIT-VALUE':
+        parsed = flat_values.str.extract(LIMIT_VALUE_PATTERN)
+        # The numbers matched the pattern, so they can be cast; unlike to_numeric, the cast turns an overflow into inf
+        numbers = parsed['number'].astype('float64').to_numpy().reshape(values.shape)
+        return [("ERROR - Value is not a number, a limit value (e.g. >8.5) or NA.", available & np.isnan(numbers)),
+                ("ERROR - Value is infinite.", available & np.isinf(numbers))]
+    if value_type == 'BINARY':
+        binary = flat_values.str.strip().str.lower().isin(BINARY_VALUES).to_numpy().reshape(values.shape)
+        return [(f"ERROR - Value is not one of {', '.join(BINARY_VALUES)} or NA.", available & ~binary)]
+    if value_type == 'CATEGORICAL':
+        # Any text is a category, but surrounding whitespace would make 'A' and 'A ' two categories
+        stripped = flat_values.str.strip().to_numpy().reshape(values.shape)
+        return [("ERROR - Value is blank, use NA for a missing value.", available & (stripped == '')),
+                ("WARNING - Value has leading or trailing whitespace.", available & (stripped != '') & (stripped != values))]
+    raise Exception(f"Unknown generic assay value type {value_type}.")
+
+def check_entity_ids(file_path, entity_ids):
+    """Checks the ENTITY_STABLE_ID column of the whole file."""
+    entity_ids = entity_ids.str.strip()
+    return check_records([
+        (ENTITY_COLUMN, "ERROR - Missing ENTITY_STABLE_ID.", entity_ids.isna().to_numpy() | (entity_ids == '').to_numpy(), None),
+        (ENTITY_COLUMN, "ERROR - Duplicate ENTITY_STABLE_ID.",
+         entity_ids.duplicated(keep=False).to_numpy() & entity_ids.notna().to_numpy(), entity_ids),
+    ], data_file=file_path)
+
+def get_chunk_rows(n_samples):
+    """Returns the number of rows per chunk of a file with n_samples sample columns."""
+    return max(1, CHUNK_CELLS // max(1, n_samples))
+
+def validate_generic_assay_matrix(file_path, value_type, property_columns=(), registry=None):
+    """Validates a generic assay file in chunks of rows. Returns one report record per failed check."""
+    comment_lines, header = data_reader.read_header(file_path)
+    missing_columns = [column for column in [ENTITY_COLUMN] + list(property_columns) if column not in header]
+    if missing_columns:
+        return [file_record(f"ERROR - Missing required column(s) in generic assay file: {', '.join(missing_columns)}.", data_file=file_path)]
+    entity_columns = [ENTITY_COLUMN] + list(property_columns)
+    sample_ids = [column for column in header if column not in entity_columns]
+    records = check_header_samples(file_path, sample_ids, registry)
+
+    entity_df = data_reader.read_data_file(file_path, columns={ENTITY_COLUMN}, dtype={ENTITY_COLUMN: str})
+    records += check_entity_ids(file_path, entity_df[ENTITY_COLUMN])
+    del entity_df
+
+    checks = RowCheckCounter(data_file=file_path)
+    offset = 0
+    # Values are kept as read ('NA' and empty values are not turned into NaN), NA_TOKENS are checked explicitly.
+    # Only the comment lines before the header are skipped, a '#' in a value is part of the value
+    with pd.read_csv(file_path, sep='\t', skiprows=comment_lines, header=0, dtype=str, keep_default_na=False,
+                     usecols=lambda column: column not in entity_columns, chunksize=get_chunk_rows(len(sample_ids))) as reader:
+        for chunk in reader:
+            values = chunk.to_numpy(dtype=str)
+            for message, mask in check_values(values, value_type):
+                # Failures are reported per sample column
+                for column in np.flatnonzero(mask.any(axis=0)):
+                    checks.add_mask(chunk.columns[column], message, mask[:, column], values[:, column], offset)
+            offset += len(chunk)
+    return records + checks.records()
+
+def validate_generic_assay_file(file_path, meta_dict=None, cache=None, registry=None,
+                                meta_file_type='GENERIC_ASSAY_CONTINUOUS', **kwargs):
+    properties = (meta_dict or {}).get('generic_entity_meta_properties', '')
+    property_columns = [column.strip() for column in properties.split(',') if column.strip()]
+
+    def validate():
+        return validate_generic_assay_matrix(file_path, VALUE_TYPES[meta_file_type], property_columns=property_columns,
+                                             registry=registry)
+
+    if cache is not None:
+        # The result also depends on the clinical file the registry was read from
+        depends_on = (registry.file_path,) if registry is not None else ()
+        return cache.cached('data', file_path, validate, depends_on=depends_on, options=(meta_file_type, properties))
+    return validate()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Columnar rule engine for the row-level checks of pydantic_schemas.MutData
+"""Applies the field and root validators of MutData as boolean masks over whole columns,
+instead of constructing a model per row. The parsing of the fields (whitespace removal,
+str/int/float coercion) follows Pydantic, so every row gets the same errors, in the same
+order and with the same messages, as MutData(**row.to_dict()).
+The values are expected as normalized by validateData.normalize_mutation_rows: stripped strings
+and None for missing values."""
+
+import numpy as np
+import pandas as pd
+import pydantic_schemas
+from error_sink import get_severity
+from pandera_schemas import SKIP_VARIANT_TYPES
+
+ROOT = '__root__'
+
+# Error types reported by Pydantic
+VALUE_ERROR = 'value_error'
+MISSING_ERROR = ('field required', 'value_error.missing')
+NONE_ERROR = ('none is not an allowed value', 'type_error.none.not_allowed')
+INTEGER_ERROR = ('value is not a valid integer', 'type_error.integer')
+FLOAT_ERROR = ('value is not a valid float', 'type_error.float')
+
+# Messages of the MutData validators
+HUGO_STARTS_WITH_INT = 'WARNING - Hugo_Symbol should not start with a number.'
+HUGO_UNKNOWN = 'WARNING - {} is not known to the cBioPortal instance. Might be new or deprecated gene symbol.'
+ENTREZ_UNKNOWN = 'WARNING - {} is not known to the cBioPortal instance. Might be new or deprecated Entrez gene id.'
+ENTREZ_MISSING = 'WARNING - Entrez Gene Id is missing for this record.'
+SAMPLE_UNKNOWN = 'ERROR - Sample ID not defined in clinical file.'
+BOTH_GENE_IDS_INVALID = 'WARNING - Both gene identifiers for this gene are not valid. This record will not be loaded.'
+HUGO_INVALID_ENTREZ_VALID = 'WARNING - Entrez gene id exists, but gene symbol specified is not known to cBioPortal. The gene symbol will be ignored.'
+ENTREZ_MISMATCH = 'ERROR - {} does not match any valid entrezGeneId for {}.'
+NO_GENES_INTERGENIC = 'INFO - This variant (Gene Symbol NA, Entrez Gene Id NA) will be filtered out.'
+NO_GENES_NOT_INTERGENIC = ("WARNING - Gene specification (Gene symbol NA, Entrez gene ID NA) for this variant implies intergenic "
+                           "even though Variant_Classification is not 'IGR' or 'Targeted_Region'; this variant will be filtered out.")
+SKIPPED_VARIANT = 'INFO - Line will not be loaded due to the variant classification filter.'
+NO_HGVSP_SHORT = 'WARNING - No HGVSp_Short value. This mutation record will get a generic "MUTATED" flag.'
+ALL_ALLELES_INVALID = 'ERROR - All Allele Based columns contain invalid character.'
+START_AFTER_END = 'ERROR - Start_Position should be smaller than or equal to End_Position.'
+INS_POSITIONS = 'ERROR - Variant_Type indicates insertion, but difference in Start_Position and                                      End_Position does not equal to 1 or the length or the Reference_Allele.'
+INS_ALLELE_LENGTHS = 'ERROR - Variant_Type indicates insertion, but length of Reference_Allele is bigger than                                      the length of the Tumor_Seq_Allele1 and/or 2 and therefore indicates deletion.'
+DEL_POSITIONS = 'ERROR - Variant_Type indicates deletion, but the difference between Start_Position and                                      End_Position are not equal to the length of the Reference_Allele.'
+DEL_ALLELE_LENGTHS = 'ERROR - Variant_Type indicates deletion, but length of Reference_Allele is smaller than                                      the length of Tumor_Seq_Allele1 and/or Tumor_Seq_Allele2, indicating an insertion.'
+SNP_ALLELE_LENGTHS = 'ERROR - Variant_Type indicates a SNP, but length of Reference_Allele, Tumor_Seq_Allele1                                      and/or Tumor_Seq_Allele2 do not equal 1.'
+DNP_ALLELE_LENGTHS = 'ERROR - Variant_Type indicates a DNP, but length of Reference_Allele, Tumor_Seq_Allele1                                       and/or Tumor_Seq_Allele2 do not equal 2.'
+TNP_ALLELE_LENGTHS = 'ERROR - Variant_Type indicates a TNP, but length of Reference_Allele, Tumor_Seq_Allele1                                      and/or Tumor_Seq_Allele2 do not equal 3.'
+ONP_ALLELE_LENGTHS = 'ERROR - Variant_Type indicates a ONP, but length of Reference_Allele,                                      Tumor_Seq_Allele1 and 2 are not bigger than 3 or are of unequal lengths.'
+NP_CONTAINS_DELETION = 'ERROR - Variant_Type indicates a {}, but Reference_Allele, Tumor_Seq_Allele1                                      and/or Tumor_Seq_Allele2 contain deletion (-).'
+ALLELES_ALL_EQUAL = 'ERROR - All Values in columns Reference_Allele, Tumor_Seq_Allele1                                  and Tumor_Seq_Allele2 are equal.'
+DEL_LOOKS_LIKE_SNP = 'ERROR - Variant_Type indicates a deletion, Allele based columns are the same length,                                   but Tumor_Seq_Allele columns do not contain -, indicating a SNP.'
+VALIDATION_ALLELES_EMPTY = 'ERROR - Validation Status is {}, but Validation Allele columns are empty.'
+VALIDATION_ALLELES_INVALID = 'ERROR - At least one of the Validation Allele Based columns (Tumor_Validation_Allele1,                                      Tumor_Validation_Allele2, Match_Norm_Validation_Allele1,                                      Match_Norm_Validation_Allele2) contains invalid character.'
+INVALID_ALLELES_DIFFER = ('ERROR - When Validation_Status is invalid, the Tumor_Validation_Allele '
+                         'and Match_Norm_Validation_Allele columns should be equal.')
+VALIDATION_METHOD_MISSING = 'ERROR - Validation Status is {}, but Validation_Method is not defined.'
+GERMLINE_ALLELES_DIFFER = 'ERROR - When Validation_Status is valid and Mutation_Status is Germline, the                                    Tumor_Validation_Allele should be equal to the Match_Norm_Validation_Allele.'
+SOMATIC_ALLELES_INVALID = 'ERROR - When Validation_Status is valid and Mutation_Status is Somatic, the                                    Match_Norm_Validation_Allele columns should be equal to the Reference Allele and                                    one of the Tumor_Validation_Allele columns should not be.'
+
+ALLELE_PATTERN = r'^[-ACTG]*$'
+VALIDATION_ALLELE_COLUMNS = ['Tumor_Validation_Allele1', 'Tumor_Validation_Allele2', 'Match_Norm_Validation_Allele1', 'Match_Norm_Validation_Allele2']
+INTEGER_PATTERN = r'[+-]?\d+'
+
+
+class RowMessage:
+    """A message template with the columns of its values, formatted only for the rows that failed."""
+
+    def __init__(self, template, *columns):
+        self.template = template
+        self.columns = columns
+
+    def format(self, positions):
+        values = [np.asarray(column, dtype=object)[positions] for column in self.columns]
+        return [self.template.format(*row_values) for row_values in zip(*values)]
+
+class RuleErrors:
+    """Collects the errors of the rules as (order, loc, mask, message, type) entries,
+    where the message is either one string or a RowMessage."""
+
+    def __init__(self, n_rows):
+        self.n_rows = n_rows
+        self.entries = []
+
+    def add(self, order, loc, mask, message, error_type=VALUE_ERROR):
+        mask = np.asarray(mask, dtype=bool)
+        if mask.any():
+            self.entries.append((order, loc, mask, message, error_type))
+
+    def to_frame(self, index):
+        """Returns one record per error (row, loc, msg, type, severity), ordered by row and then in the order Pydantic
+        reports them. The severity is the prefix of the message (see error_sink.get_severity)."""
+        rows, orders, locs, messages, types, severities = [], [], [], [], [], []
+        for order, loc, mask, message, error_type in self.entries:
+            positions = np.flatnonzero(mask)
+            rows.append(positions)
+            orders.append(np.full(len(positions), order))
+            locs.append(np.full(len(positions), loc, dtype=object))
+            if isinstance(message, str):
+                messages.append(np.full(len(positions), message, dtype=object))
+            else:
+                messages.append(np.asarray(message.format(positions), dtype=object))
+            types.append(np.full(len(positions), error_type, dtype=object))
+            # The messages of an entry share their prefix
+            severities.append(np.full(len(positions), get_severity(messages[-1][0]), dtype=object))
+        if not rows:
+            return pd.DataFrame(columns=['row', 'loc', 'msg', 'type', 'severity'])
+        rows = np.concatenate(rows)
+        orders = np.concatenate(orders)
+        sort_order = np.lexsort((orders, rows))
+        return pd.DataFrame({
+            'row': np.asarray(index)[rows[sort_order]],
+            'loc': np.concatenate(locs)[sort_order],
+            'msg': np.concatenate(messages)[sort_order],
+            'type': np.concatenate(types)[sort_order],
+            'severity': np.concatenate(severities)[sort_order],
+        })
+
+
+# Functions to parse a column like the Pydantic field types. Each returns the parsed values
+# (None where the value is None), a mask of values that are None and a mask of values that failed to parse.
+def _is_str(series):
+    if pd.api.types.infer_dtype(series, skipna=True) not in ('string', 'empty', 'mixed', 'mixed-integer'):
+        # No string values, e.g. an object column of numbers
+        return pd.Series(False, index=series.index)
+    # The length of a value that is not a string is NaN
+    return series.str.len().notna()
+
+def _is_none(series):
+    return np.equal(series.to_numpy(dtype=object), None)
+
+def parse_str_column(series):
+    if series.dtype != object:
+        # Numbers are converted to their string representation (NaN becomes 'nan')
+        return series.astype(str).astype(object), np.zeros(len(series), dtype=bool), np.zeros(len(series), dtype=bool)
+    values, is_str = series, _is_str(series)
+    is_none = _is_none(values)
+    other = ~is_str.to_numpy() & ~is_none
+    if other.any():
+        values = values.copy()
+        values[other] = values[other].map(str)
+    return values, is_none, np.zeros(len(series), dtype=bool)
+
+def parse_int_column(series):
+    if series.dtype.kind in 'iub':
+        return series.astype('int64'), np.zeros(len(series), dtype=bool), np.zeros(len(series), dtype=bool)
+    if series.dtype.kind == 'f':
+        invalid = ~np.isfinite(series.to_numpy())
+        return np.trunc(series.where(~invalid, 0)).astype('int64'), np.zeros(len(series), dtype=bool), invalid
+    values, is_str = series, _is_str(series)
+    is_none = _is_none(values)
+    numbers = pd.to_numeric(values.where(~is_str, None), errors='coerce')
+    valid_number = numbers.notna() & np.isfinite(numbers.fillna(0))
+    valid_str = is_str & values.where(is_str, '').str.fullmatch(INTEGER_PATTERN)
+    parsed = pd.Series(0, index=series.index, dtype='int64')
+    parsed[valid_number] = np.trunc(numbers[valid_number]).astype('int64')
+    parsed[valid_str] = values[valid_str].astype('int64')
+    invalid = ~(valid_number | valid_str).to_numpy() & ~is_none
+    return parsed, is_none, invalid
+
+def parse_float_column(series):
+    if series.dtype.kind in 'iubf':
+        return series.astype('float64'), np.zeros(len(series), dtype=bool), np.zeros(len(series), dtype=bool)
+    values, is_str = series, _is_str(series)
+    is_none = _is_none(values)
+    parsed = pd.to_numeric(values.where(~pd.Series(is_none, index=series.index), np.nan), errors='coerce')
+    # float() accepts 'nan' and 'inf', to_numeric turns unparseable values into NaN as well
+    nan_str = is_str & values.where(is_str, '').str.lower().isin(['nan', '+nan', '-nan'])
+    was_nan = values.isna() & ~pd.Series(is_none, index=series.index)
+    invalid = (parsed.isna() & ~nan_str & ~was_nan).to_numpy() & ~is_none
+    return parsed, is_none, invalid
+
+FIELD_PARSERS = {str: parse_str_column, int: parse_int_column, float: parse_float_column}
+
+
+def validate_fields(data_df, errors, genes, sample_ids=None):
+    """Parses and validates the MutData fields. Returns the parsed values per field, a mask per field
+    of the rows where the field is available to the root validators (parsed, valid and not None) and
+    a mask per field of the rows where the field is given as missing (None, or not in the file)."""
+    values = {}
+    present = {}
+    missing = {}
+    n_rows = len(data_df)
+    for order, (name, field) in enumerate(pydantic_schemas.MutData.__fields__.items()):
+        if name not in data_df.columns:
+            values[name] = pd.Series([None] * n_rows, index=data_df.index, dtype=object)
+            present[name] = np.zeros(n_rows, dtype=bool)
+            # An optional field that is not given gets its default, None
+            missing[name] = np.full(n_rows, not field.required)
+            if field.required:
+                errors.add(order, name, np.ones(n_rows, dtype=bool), *MISSING_ERROR)
+            continue
+
+        parsed, is_none, invalid = FIELD_PARSERS[field.type_](data_df[name])
+        if field.required:
+            errors.add(order, name, is_none, *NONE_ERROR)
+        if field.type_ is int:
+            errors.add(order, name, invalid, *INTEGER_ERROR)
+        elif field.type_ is float:
+            errors.add(order, name, invalid, *FLOAT_ERROR)
+        # Custom field validators only run on parsed values, and the first failing validator of a field wins
+        failed = invalid.copy()
+        checked = ~invalid & ~is_none
+
+        if name == 'Hugo_Symbol':
+            starts_with_int = checked & parsed.str[:1].isin(list('0123456789')).to_numpy()
+            errors.add(order, name, starts_with_int, HUGO_STARTS_WITH_INT)
+            failed |= starts_with_int
+            if genes is not None:
+                unknown = checked & ~starts_with_int & ~genes.has_symbols(parsed)
+                errors.add(order, name, unknown, RowMessage(HUGO_UNKNOWN, parsed))
+                failed |= unknown
+        elif name == 'Entrez_Gene_Id':
+            no_entrez_id = checked & parsed.isna().to_numpy()
+            errors.add(order, name, no_entrez_id, ENTREZ_MISSING)
+            failed |= no_entrez_id
+            if genes is not None:
+                entrez_ids = np.trunc(parsed.fillna(0)).astype('int64')
+                unknown = checked & ~no_entrez_id & ~genes.has_entrez_ids(entrez_ids)
+                errors.add(order, name, unknown, RowMessage(ENTREZ_UNKNOWN, entrez_ids))
+                failed |= unknown
+        elif name == 'Tumor_Sample_Barcode' and sample_ids is not None:
+            unknown = checked & ~parsed.isin(sample_ids).to_numpy()
+            errors.add(order, name, unknown, SAMPLE_UNKNOWN)
+            failed |= unknown
+
+        values[name] = parsed
+        present[name] = ~failed & ~is_none
+        missing[name] = is_none & (not field.required)
+    return values, present, missing
+
+
+# Root validators, in the order they are defined on MutData. Each gets the parsed values, the availability
+# masks, the missing masks and the gene table (None when the genes are not checked), and returns a list of
+# (mask, message) pairs.
+def resolve_symbol_entrez(values, present, missing, genes):
+    if genes is None:
+        return []
+    hugo, entrez = present['Hugo_Symbol'], present['Entrez_Gene_Id']
+    # Variants without gene identifiers are checked by skip_variant
+    no_genes = missing['Hugo_Symbol'] & missing['Entrez_Gene_Id']
+    # The Entrez gene ID of the first gene of the symbol
+    matching_entrez_ids = genes.symbol_entrez_ids(values['Hugo_Symbol'])
+    mismatch = hugo & entrez & (np.trunc(values['Entrez_Gene_Id'].fillna(0)).to_numpy() != matching_entrez_ids)
+    return [(~hugo & ~entrez & ~no_genes, BOTH_GENE_IDS_INVALID),
+            (~hugo & entrez, HUGO_INVALID_ENTREZ_VALID),
+            (mismatch, RowMessage(ENTREZ_MISMATCH, values['Entrez_Gene_Id'], values['Hugo_Symbol']))]
+
+def skip_variant(values, present, missing, genes):
+    classified = present['Variant_Classification']
+    no_genes = classified & missing['Hugo_Symbol'] & missing['Entrez_Gene_Id']
+    intergenic = no_genes & values['Variant_Classification'].isin(['IGR', 'Targeted_Region']).to_numpy()
+    skipped = (classified & present['Hugo_Symbol'] & present['Entrez_Gene_Id']
+               & values['Variant_Classification'].isin(SKIP_VARIANT_TYPES).to_numpy())
+    return [(intergenic, NO_GENES_INTERGENIC), (no_genes & ~intergenic, NO_GENES_NOT_INTERGENIC), (skipped & ~no_genes, SKIPPED_VARIANT)]
+
+def non_splice_sites(values, present, missing, genes):
+    no_protein_change = (present['Variant_Classification'] & (values['Variant_Classification'] != 'Splice_Site').to_numpy()
+                         & missing['HGVSp_Short'])
+    return [(no_protein_change, NO_HGVSP_SHORT)]
+
+def maf_check_6(values, present, missing, genes):
+    available = present['Reference_Allele'] & present['Tumor_Seq_Allele1'] & present['Tumor_Seq_Allele2']
+    invalid = available.copy()
+    for column in ['Reference_Allele', 'Tumor_Seq_Allele1', 'Tumor_Seq_Allele2']:
+        invalid &= ~values[column].str.match(ALLELE_PATTERN).fillna(False).to_numpy(dtype=bool)
+    return [(invalid, ALL_ALLELES_INVALID)]
+
+def maf_check_10(values, present, missing, genes):
+    available = present['Start_Position'] & present['End_Position']
+    return [(available & (values['Start_Position'] > values['End_Position']).to_numpy(), START_AFTER_END)]
+
+def maf_check_11(values, present, missing, genes):
+    available = (present['Variant_Type'] & present['End_Position'] & present['Start_Position']
+                 & present['Reference_Allele'] & present['Tumor_Seq_Allele1'] & present['Tumor_Seq_Allele2'])
+    variant_type = values['Variant_Type']
+    span = (values['End_Position'] - values['Start_Position']).to_numpy()
+    ref_length = values['Reference_Allele'].str.len().to_numpy(dtype=float)
+    allele1_length = values['Tumor_Seq_Allele1'].str.len().to_numpy(dtype=float)
+    allele2_length = values['Tumor_Seq_Allele2'].str.len().to_numpy(dtype=float)
+    is_ins, is_del = (variant_type == 'INS').to_numpy(), (variant_type == 'DEL').to_numpy()
+
+    # The checks of the validator in order, only the first failing check of a row is reported
+    checks = [
+        (is_ins & ~(((span + 1) == ref_length) | (span == 1)), INS_POSITIONS),
+        # Same precedence as the validator: (not ref <= allele1) or (ref <= allele2)
+        (is_ins & (~(ref_length <= allele1_length) | (ref_length <= allele2_length)), INS_ALLELE_LENGTHS),
+        (is_del & ((span + 1) != ref_length), DEL_POSITIONS),
+        (is_del & ((ref_length < allele1_length) | (ref_length < allele2_length)), DEL_ALLELE_LENGTHS),
+    ]
+    for np_type, allele_length, message in [('SNP', 1, SNP_ALLELE_LENGTHS), ('DNP', 2, DNP_ALLELE_LENGTHS), ('TNP', 3, TNP_ALLELE_LENGTHS)]:
+        checks.append(((variant_type == np_type).to_numpy()
+                       & ~((ref_length == allele_length) & (allele1_length == allele_length) & (allele2_length == allele_length)), message))
+    checks.append(((variant_type == 'ONP').to_numpy()
+                   & ((ref_length != allele1_length) | (allele1_length != allele2_length)
+                      | ((ref_length <= 3) & (allele1_length <= 3) & (allele2_length <= 3))), ONP_ALLELE_LENGTHS))
+    contains_deletion = np.zeros(len(variant_type), dtype=bool)
+    for column in ['Reference_Allele', 'Tumor_Seq_Allele1', 'Tumor_Seq_Allele2']:
+        contains_deletion |= values[column].str.contains('-', regex=False).fillna(False).to_numpy(dtype=bool)
+    checks.append((variant_type.isin(['SNP', 'DNP', 'TNP', 'ONP']).to_numpy() & contains_deletion,
+                   RowMessage(NP_CONTAINS_DELETION, variant_type)))
+
+    reported = ~available
+    results = []
+    for mask, message in checks:
+        mask = mask & ~reported
+        results.append((mask, message))
+        reported |= mask
+    return results
+
+def checkAlleleSpecialCases(values, present, missing, genes):
+    available = present['Reference_Allele'] & present['Tumor_Seq_Allele1'] & present['Tumor_Seq_Allele2']
+    ref, allele1, allele2 = values['Reference_Allele'], values['Tumor_Seq_Allele1'], values['Tumor_Seq_Allele2']
+    all_equal = available & ((ref == allele1) & (allele1 == allele2)).to_numpy()
+    ref_length = ref.str.len().astype(float)
+    looks_like_snp = (available & ~all_equal
+                      & ((values['Variant_Type'] == 'DEL') & (ref_length == allele1.str.len().astype(float)) & (ref_length == allele2.str.len().astype(float))
+                         & ~allele1.str.contains('-', regex=False).fillna(True) & ~allele2.str.contains('-', regex=False).fillna(True)).to_numpy(dtype=bool))
+    return [(all_equal, ALLELES_ALL_EQUAL), (looks_like_snp, DEL_LOOKS_LIKE_SNP)]
+
+def maf_check_7_and_8(values, present, missing, genes):
+    status = values['Validation_Status'].str.lower()
+    validated = present['Validation_Status'] & status.isin(['valid', 'invalid']).to_numpy()
+    # A validation allele that is missing (or failed its validation) is not in the values of the validator
+    empty = np.zeros(len(status), dtype=bool)
+    invalid_character = np.zeros(len(status), dtype=bool)
+    for column in VALIDATION_ALLELE_COLUMNS:
+        empty |= ~present[column]
+        invalid_character |= ~values[column].str.match(ALLELE_PATTERN).fillna(False).to_numpy(dtype=bool)
+    tumor_allele1, tumor_allele2 = values['Tumor_Validation_Allele1'], values['Tumor_Validation_Allele2']
+    norm_allele1, norm_allele2 = values['Match_Norm_Validation_Allele1'], values['Match_Norm_Validation_Allele2']
+    alleles_differ = (status == 'invalid').to_numpy() & ((tumor_allele1 != norm_allele1) | (tumor_allele2 != norm_allele2)).to_numpy()
+    return [(validated & empty, RowMessage(VALIDATION_ALLELES_EMPTY, values['Validation_Status'])),
+            (validated & invalid_character, VALIDATION_ALLELES_INVALID),
+            (validated & alleles_differ, INVALID_ALLELES_DIFFER)]
+
+def maf_check_13(values, present, missing, genes):
+    available = present['Validation_Status'] & present['Validation_Method']
+    undefined = (available
+                 & values['Validation_Status'].str.lower().isin(['valid', 'invalid']).to_numpy()
+                 & values['Validation_Method'].str.lower().isin(['none', 'na']).to_numpy())
+    return [(undefined, RowMessage(VALIDATION_METHOD_MISSING, values['Validation_Status']))]
+
+def maf_check_9(values, present, missing, genes):
+    available = present['Mutation_Status'] & present['Validation_Status']
+    for column in VALIDATION_ALLELE_COLUMNS:
+        available &= present[column]
+    mutation_status = values['Mutation_Status'].str.lower()
+    valid = (values['Validation_Status'].str.lower() == 'valid').to_numpy()
+    tumor_allele1, tumor_allele2 = values['Tumor_Validation_Allele1'], values['Tumor_Validation_Allele2']
+    norm_allele1, norm_allele2 = values['Match_Norm_Validation_Allele1'], values['Match_Norm_Validation_Allele2']
+    ref_allele = values['Reference_Allele']
+
+    germline = available & valid & (mutation_status == 'germline').to_numpy()
+    somatic = available & valid & (mutation_status == 'somatic').to_numpy()
+    germline_differs = germline & ((tumor_allele1 != norm_allele1) | (tumor_allele2 != norm_allele2)).to_numpy()
+    somatic_invalid = somatic & (((norm_allele1 != norm_allele2) | (norm_allele2 != ref_allele))
+                                 & ((tumor_allele1 != ref_allele) | (tumor_allele2 != ref_allele))).to_numpy()
+    return [(germline_differs, GERMLINE_ALLELES_DIFFER), (somatic_invalid, SOMATIC_ALLELES_INVALID)]
+
+ROOT_VALIDATORS = [
+    resolve_symbol_entrez,
+    skip_variant,
+    non_splice_sites,
+    maf_check_6,
+    maf_check_10,
+    maf_check_11,
+    checkAlleleSpecialCases,
+    maf_check_7_and_8,
+    maf_check_13,
+    maf_check_9,
+]
+
+
+def validate_mutation_rows(data_df, genes=None, sample_ids=None):
+    """Applies the MutData checks to all rows of the mutation data at once. Without a gene table (genes, see
+    gene_table.GeneTable), the genes are not checked against cBioPortal.
+    Returns one record per error (row, loc, msg, type, severity), in the order MutData reports them."""
+    errors = RuleErrors(len(data_df))
+    values, present, missing = validate_fields(data_df, errors, genes, sample_ids)
+    root_order = len(pydantic_schemas.MutData.__fields__)
+    for order, root_validator in enumerate(ROOT_VALIDATORS, start=root_order):
+        # A row gets at most one error per root validator
+        reported = np.zeros(len(data_df), dtype=bool)
+        for mask, message in root_validator(values, present, missing, genes):
+            mask = np.asarray(mask, dtype=bool) & ~reported
+            errors.add(order, ROOT, mask, message)
+            reported |= mask
+    return errors.to_frame(data_df.index)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Vectorized custom checks for the Pandera schemas
+"""Each function returns a pa.Check that is evaluated on the whole column at once (over .str or
+with isin against a frozen set), instead of an element_wise check that calls a Python function per cell.
+The checks fail on the same values as the element-wise lambdas they replace: string methods
+return NaN for values that are not strings, and these fail the check like the lambda raising
+on them would. Missing values are handled by Pandera (ignore_na)."""
+
+import pandera as pa
+
+
+def isin_case_insensitive(allowed_values, **check_kwargs):
+    """Checks that the lower case of each value is one of the allowed values (x.lower() in allowed_values)."""
+    allowed_values = frozenset(value.lower() for value in allowed_values)
+    return pa.Check(lambda series: series.str.lower().isin(allowed_values), **check_kwargs)
+
+def notin_case_insensitive(forbidden_values, **check_kwargs):
+    """Checks that the lower case of each value is none of the forbidden values (x.lower() not in forbidden_values)."""
+    forbidden_values = frozenset(value.lower() for value in forbidden_values)
+    def check(series):
+        lowered = series.str.lower()
+        return lowered.notna() & ~lowered.isin(forbidden_values)
+    return pa.Check(check, **check_kwargs)
+
+def isin_set(allowed_values, **check_kwargs):
+    """Checks that each value is one of the allowed values (x in allowed_values), with a frozen set lookup."""
+    allowed_values = frozenset(allowed_values)
+    return pa.Check(lambda series: series.isin(allowed_values), **check_kwargs)
+
+def not_startswith(prefixes, **check_kwargs):
+    """Checks that no value starts with one of the prefixes (x.startswith(prefixes) == False)."""
+    prefixes = tuple(prefixes)
+    # eq(False) also fails the values that are not strings, for which startswith returns NaN
+    return pa.Check(lambda series: series.str.startswith(prefixes).eq(False), **check_kwargs)
+
+def not_null(**check_kwargs):
+    """Checks that no value is missing (pd.notna(x)). Use with ignore_na=False."""
+    return pa.Check(lambda series: series.notna(), **check_kwargs)
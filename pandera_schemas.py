@@ -9,6 +9,7 @@ import re
 import pandera as pa
 from pandera import Check, Column, DataFrameSchema, Index, MultiIndex
 from pandera.errors import SchemaError
+import pandera_checks
 
 # # Read mutations data into pandas dataframe
 # mut_data = pd.read_csv(os.path.join(file_dir, "data_mutations.txt"), sep='\t', comment='#', header=0)
@@ -97,6 +98,9 @@ REQUIRED_ASCN_COLUMNS = [
     'ASCN.EXPECTED_ALT_COPIES'
 ]
 
+# Columns that are not in the schema, but whose presence is checked by the table-wide checks
+CROSS_CHECK_COLUMNS = ['Amino_Acid_Change'] + REQUIRED_ASCN_COLUMNS
+
 
 # Define custom functions for checks that are not built-in 
 # Table-wide custom checks
@@ -141,8 +145,7 @@ mut_schema = DataFrameSchema(
         "Hugo_Symbol": Column(
             dtype="object",
             checks=[
-                pa.Check(lambda x: x.startswith(tuple(map(str, range(10))))==False,
-                         element_wise=True,
+                pandera_checks.not_startswith(map(str, range(10)),
                          ignore_na=True,
                          error="ERROR - Hugo_Symbol should not start with a number."),
             ],
@@ -157,8 +160,7 @@ mut_schema = DataFrameSchema(
         "Entrez_Gene_Id": Column(
             dtype="float64",
             checks=[
-                pa.Check(lambda x: x >= 0.0, 
-                         element_wise=True,
+                Check.ge(0.0, 
                          ignore_na=True,
                          error="ERROR - Entrez gene is non-positive."), 
             ],
@@ -188,8 +190,7 @@ mut_schema = DataFrameSchema(
         "Chromosome": Column(
             dtype="object",
             checks=[
-                pa.Check(lambda x: x in ["1", "2", "3", "4", "5", "6", "7", "8", "9", "10", "11", "12", "13", "14", "15", "16", "17", "18", "19", "20", "21", "22", "23", "X"],
-                         element_wise=True,
+                pandera_checks.isin_set(["1", "2", "3", "4", "5", "6", "7", "8", "9", "10", "11", "12", "13", "14", "15", "16", "17", "18", "19", "20", "21", "22", "23", "X"],
                          ignore_na=True, 
                          error="ERROR - Chromosome not found in the genome."),
             ],
@@ -388,8 +389,7 @@ mut_schema = DataFrameSchema(
         "Verification_Status": Column(
             dtype="object",
             checks=[
-                pa.Check(lambda x: x.lower() in ["verified", "unknown", "na"],
-                         element_wise = True,
+                pandera_checks.isin_case_insensitive(["verified", "unknown", "na"],
                          ignore_na = True,
                          error = f"ERROR - Value in 'Verification_Status' not in MAF format."),
             ],
@@ -404,8 +404,7 @@ mut_schema = DataFrameSchema(
         "Validation_Status": Column(
             dtype="object",
             checks=[
-                pa.Check(lambda x: x.lower() in ["untested", "inconclusive", "valid", "invalid", "na", "redacted", "unknown"],
-                         element_wise = True, 
+                pandera_checks.isin_case_insensitive(["untested", "inconclusive", "valid", "invalid", "na", "redacted", "unknown"],
                          ignore_na = True, 
                          error = f"WARNING - Value in 'Validation_Status' not in MAF format."),
             ],
@@ -420,12 +419,10 @@ mut_schema = DataFrameSchema(
         "Mutation_Status": Column(
             dtype="object",
             checks=[
-                pa.Check(lambda x: x.lower() in ["germline", "somatic", "post-transcriptional modification", "unknown"],
-                         element_wise = True, 
+                pandera_checks.isin_case_insensitive(["germline", "somatic", "post-transcriptional modification", "unknown"],
                          ignore_na = True, 
                          error = 'WARNING - Mutation_Status value is not in MAF format'),
-                pa.Check(lambda x: x.lower() not in ["loh", "none", "wildtype"],
-                         element_wise = True,
+                pandera_checks.notin_case_insensitive(["loh", "none", "wildtype"],
                          ignore_na = True, 
                          error = 'INFO - Mutation will not be loaded due to value in Mutation_Status'),
             ],
@@ -522,8 +519,7 @@ mut_schema = DataFrameSchema(
         "SWISSPROT": Column(
             dtype="object",
             checks=[
-                pa.Check(lambda x: pd.notna(x),
-                             element_wise = True,
+                pandera_checks.not_null(
                              ignore_na = False,
                              error = "WARNING - Missing value in SWISSPROT column; this column is recommended to make sure that the UniProt canonical isoform is used when drawning Pfam domains in the mutations view."),
             ],
@@ -571,6 +567,24 @@ mut_schema = DataFrameSchema(
     description=None,
 )
 
+# Schemas for validating the mutation data in chunks. 
+# The table-wide checks and the presence of required columns only depend on the header, 
+# so they are validated once on the (empty) header instead of on every chunk.
+mut_header_schema = DataFrameSchema(
+    columns={
+        column_name: Column(dtype=None, nullable=True, required=column.required)
+        for column_name, column in mut_schema.columns.items()
+    },
+    checks=mut_schema.checks,
+    unique_column_names=True,
+)
+
+mut_chunk_schema = mut_schema.update_columns(
+    {column_name: {"required": False} for column_name in mut_schema.columns}
+)
+mut_chunk_schema.checks = []
+mut_chunk_schema.unique_column_names = False
+
 # # Validated data against schema
 # try: 
 #     mut_schema.validate(mut_data, lazy=True)
@@ -8,9 +8,13 @@ from typing import Optional
 import re
 import warnings
 import requests
+from pandera_schemas import SKIP_VARIANT_TYPES
+import gene_table
 
-# Read the gene table into a dataframe 
-genes_api = pd.read_json('http://cbioportal.org/api/genes')
+# The gene table is read from the local snapshot on first use (see gene_table)
+
+# Sample IDs to check Tumor_Sample_Barcode against, e.g. the sample_ids of a sample_registry.SampleRegistry
+SAMPLE_IDS = None
 
 # Read the chromosome JSON
 chrom_sizes = {"hg19": {"1": 249250621, "2": 243199373, "3": 198022430, "4": 191154276, "5": 180915260, "6": 171115067, "7": 159138663, "X": 155270560, "8": 146364022, "9": 141213431, "10": 135534747, "11": 135006516, "12": 133851895, "13": 115169878, "14": 107349540, "15": 102531392, "16": 90354753, "17": 81195210, "18": 78077248, "20": 63025520, "Y": 59373566, "19": 59128983, "22": 51304566, "21": 48129895}, "hg38": {"1": 248956422, "2": 242193529, "3": 198295559, "4": 190214555, "5": 181538259, "6": 170805979, "7": 159345973, "X": 156040895, "8": 145138636, "9": 138394717, "11": 135086622, "10": 133797422, "12": 133275309, "13": 114364328, "14": 107043718, "15": 101991189, "16": 90338345, "17": 83257441, "18": 80373285, "20": 64444167, "19": 58617616, "Y": 57227415, "22": 50818468, "21": 46709983}, "mm10": {"1": 195471971, "2": 182113224, "X": 171031299, "3": 160039680, "4": 156508116, "5": 151834684, "6": 149736546, "7": 145441459, "10": 130694993, "8": 129401213, "14": 124902244, "9": 124595110, "11": 122082543, "13": 120421639, "12": 120129022, "15": 104043685, "16": 98207768, "17": 94987271, "Y": 91744698, "18": 90702639, "19": 61431566}}
@@ -26,6 +30,10 @@ def keys_exist(values, keys):
             return False
     return True
 
+# Function to check if a field was given as missing (None), as opposed to failing its validation
+def is_missing(values, key):
+    return key in values and values[key] is None
+
 '''
 # To check the alias table
 def check_gene_alias(v):
@@ -35,8 +43,10 @@ def check_gene_alias(v):
     elif response.status_code == 404:
         return False  # Gene does not exist'''
 
+# The values of a row are expected stripped, with None for missing values (see validateData.normalize_mutation_rows)
 class MutData(BaseModel):
-    Hugo_Symbol: str 
+    # Hugo_Symbol may be missing for intergenic variants (see skip_variant)
+    Hugo_Symbol: Optional[str] = None
 #    Entrez_Gene_Id: float | None
     Entrez_Gene_Id: Optional[float] = None
     NCBI_Build: Optional[str] = None
@@ -70,16 +80,12 @@ class MutData(BaseModel):
     class which is named cls as a convention. The second argument is the 
     value of the field being validated, it can be named as you please."""   
     
-    @validator("*", pre = True)
-    def remove_whitespaces(cls, value):
-        if isinstance(value, str):
-            return value.strip()
-        return value
-    
-    # Hugo_Symbol checks
+    # Hugo_Symbol checks, a missing (None) Hugo_Symbol or Entrez_Gene_Id is checked by the root validators
     @validator('Hugo_Symbol')
     @classmethod
     def not_start_with_int(cls, value):
+        if value is None:
+            return value
         if value.startswith(tuple(map(str, range(10))))==True:
             raise ValueError(f"WARNING - Hugo_Symbol should not start with a number.")
         return value
@@ -89,8 +95,10 @@ class MutData(BaseModel):
     def validate_hugo_symbol(cls, value):
 #        genes_api_response = requests.get(f"http://cbioportal.org/api/genes/{value.upper()}")
 #        alias_api_response = requests.get(f"http://www.cbioportal.org/api/genes/{value.upper()}/aliases")
-        if pd.notna(value) or value is None:
-            if value.upper() not in genes_api["hugoGeneSymbol"].values:
+        if value is None:
+            return value
+        if pd.notna(value):
+            if not gene_table.get_gene_table().has_symbol(value.upper()):
                 raise ValueError(f"WARNING - {value} is not known to the cBioPortal instance. Might be new or deprecated gene symbol.")
         else:
             raise ValueError(f"WARNING - Hugo Gene Symbol is missing for this record.")
@@ -102,8 +110,10 @@ class MutData(BaseModel):
     def validate_entrez_gene_id(cls, value):
 #        genes_api_response = requests.get(f"http://cbioportal.org/api/genes/{int(value)}")
 #        alias_api_response = requests.get(f"http://www.cbioportal.org/api/genes/{int(value)}/aliases")
-        if pd.notna(value) or value is None:
-            if int(value) not in genes_api["entrezGeneId"].values:
+        if value is None:
+            return value
+        if pd.notna(value):
+            if not gene_table.get_gene_table().has_entrez_id(int(value)):
                 raise ValueError(f"WARNING - {int(value)} is not known to the cBioPortal instance. Might be new or deprecated Entrez gene id.") 
         else:
             raise ValueError(f"WARNING - Entrez Gene Id is missing for this record.")
@@ -113,7 +123,8 @@ class MutData(BaseModel):
     @validator('Tumor_Sample_Barcode')
     @classmethod
     def validate_tumor_sample_barcode(cls, value):
-        if value not in SAMPLE_IDS:
+        # Without sample IDs, the samples are checked per file against the sample registry
+        if SAMPLE_IDS is not None and value not in SAMPLE_IDS:
             raise ValueError(f"ERROR - Sample ID not defined in clinical file.")
         return value
                        
@@ -122,6 +133,10 @@ class MutData(BaseModel):
     def resolve_symbol_entrez(cls, values):
         required_fields = ['Hugo_Symbol', 'Entrez_Gene_Id']
         
+        # Variants without gene identifiers are checked by skip_variant
+        if is_missing(values, 'Hugo_Symbol') and is_missing(values, 'Entrez_Gene_Id'):
+            return values
+
         if keys_exist(values, ['Hugo_Symbol']) is False and keys_exist(values, ['Entrez_Gene_Id']) is False:
             raise ValueError(f"WARNING - Both gene identifiers for this gene are not valid. This record will not be loaded.")
             
@@ -133,7 +148,7 @@ class MutData(BaseModel):
             entrez_id = values.get('Entrez_Gene_Id')
 #            gene_api_response = requests.get(f"http://cbioportal.org/api/genes/{hugo_symbol.upper()}").json()
 
-            matching_entrez_gene_id = genes_api.loc[genes_api['hugoGeneSymbol'] == hugo_symbol.upper()]['entrezGeneId'].iloc[0]
+            matching_entrez_gene_id = gene_table.get_gene_table().entrez_id(hugo_symbol.upper())
 
             if int(entrez_id) != matching_entrez_gene_id:
                 raise ValueError(f"ERROR - {entrez_id} does not match any valid entrezGeneId for {hugo_symbol}.")       
@@ -142,32 +157,30 @@ class MutData(BaseModel):
     # Default values - pre=False
     @root_validator(pre = False)
     def skip_variant(cls, values):
-        required_fields = ['Hugo_Symbol', 'Entrez_Gene_Id', 'Variant_Classification']
+        required_fields = ['Variant_Classification']
         
         if keys_exist(values, required_fields):
-            if pd.isna(values['Hugo_Symbol']) and pd.isna(values['Entrez_Gene_Id']):
-                is_silent = True 
+            if is_missing(values, 'Hugo_Symbol') and is_missing(values, 'Entrez_Gene_Id'):
                 if values['Variant_Classification'] in ['IGR', 'Targeted_Region']:
                     raise ValueError(f"INFO - This variant (Gene Symbol NA, Entrez Gene Id NA) will be filtered out.")
                 else:
-                    raise ValueError(f"WARNING - Gene specification (Gene symbol NA, Entrez gene ID NA) for this variant \
-                                     implies intergenic even though Variant_Classification is \
-                                     not 'IGR' or 'Targeted_Region'; this variant will be filtered out.")
-            elif values['Variant_Classification'] in SKIP_VARIANT_TYPES:
+                    raise ValueError(f"WARNING - Gene specification (Gene symbol NA, Entrez gene ID NA) for this variant "
+                                     f"implies intergenic even though Variant_Classification is "
+                                     f"not 'IGR' or 'Targeted_Region'; this variant will be filtered out.")
+            elif keys_exist(values, ['Hugo_Symbol', 'Entrez_Gene_Id']) and values['Variant_Classification'] in SKIP_VARIANT_TYPES:
                 raise ValueError(f"INFO - Line will not be loaded due to the variant classification filter.")
 
         return values
     
     @root_validator(skip_on_failure = False)
     def non_splice_sites(cls, values):
-        required_fields = ['Variant_Classification', 'HGVSp_Short']
+        required_fields = ['Variant_Classification']
         
         # check if a non-blank amino acid change exists for non-splice sites
         if keys_exist(values, required_fields):
             if values["Variant_Classification"] not in ['Splice_Site']:
-                if pd.isna(values["HGVSp_Short"]):
-                    raise ValueError(f'No HGVSp_Short value. This mutation record will get \
-                                     a generic "MUTATED" flag.')
+                if is_missing(values, "HGVSp_Short"):
+                    raise ValueError(f'WARNING - No HGVSp_Short value. This mutation record will get a generic "MUTATED" flag.')
         
         return values
     
@@ -281,35 +294,32 @@ class MutData(BaseModel):
     """
     @root_validator(skip_on_failure = False)
     def maf_check_7_and_8(cls, values):
-        required_fields = ['Validation_Status', 'Tumor_Validation_Allele1', 'Tumor_Validation_Allele2', 'Match_Norm_Validation_Allele1', 'Match_Norm_Validation_Allele2']
+        required_fields = ['Validation_Status']
         
         if keys_exist(values, required_fields):
             # Check #7 and #8: When validation status is valid or invalid the Validation_Allele columns cannot be null
             validation_status = values["Validation_Status"]
-            tumor_allele1 = values["Tumor_Validation_Allele1"]
-            tumor_allele2 = values["Tumor_Validation_Allele2"]
-            norm_allele1 = values["Match_Norm_Validation_Allele1"]
-            norm_allele2 = values["Match_Norm_Validation_Allele2"]
+            tumor_allele1 = values.get("Tumor_Validation_Allele1")
+            tumor_allele2 = values.get("Tumor_Validation_Allele2")
+            norm_allele1 = values.get("Match_Norm_Validation_Allele1")
+            norm_allele2 = values.get("Match_Norm_Validation_Allele2")
+            alleles = [tumor_allele1, tumor_allele2, norm_allele1, norm_allele2]
 
             if validation_status.lower() == "valid" or validation_status.lower() == "invalid":
-                if pd.isna(tumor_allele1) or pd.isna(tumor_allele2) or pd.isna(norm_allele1) or pd.isna(norm_allele2):
-                    raise ValueError("ERROR - Validation Status is %s, but Validation Allele columns are empty. \
-                                      % validation_status")
+                if any(allele is None for allele in alleles):
+                    raise ValueError(f"ERROR - Validation Status is %s, but Validation Allele columns are empty." % validation_status)
 
                 # Check when Allele Columns are not empty if the Allele Based columns contain either -,A,C,T,G
-                elif not re.match(tumor_allele1, r'^[-ACTG]*$') and \
-                    not re.match(tumor_allele2, r'^[-ACTG]*$') and \
-                    not re.match(norm_allele1, r'^[-ACTG]*$') and \
-                    not re.match(norm_allele2, r'^[-ACTG]*$'):
+                elif any(not re.match(r'^[-ACTG]*$', allele) for allele in alleles):
                     raise ValueError(f"ERROR - At least one of the Validation Allele Based columns (Tumor_Validation_Allele1, \
                                      Tumor_Validation_Allele2, Match_Norm_Validation_Allele1, \
                                      Match_Norm_Validation_Allele2) contains invalid character.")
 
-            # And in case of invalid also checks if validation alleles from tumor and normal match
-            elif validation_status.lower() == "invalid" \
-                    and (tumor_allele1 != norm_allele1 or tumor_allele2 != norm_allele2):
-                raise ValueError(f"ERROR - When Validation_Status is invalid, the Tumor_Validation_Allele \
-                                 and Match_Norm_Validation_Allele columns should be equal.")
+                # And in case of invalid also checks if validation alleles from tumor and normal match
+                elif validation_status.lower() == "invalid" \
+                        and (tumor_allele1 != norm_allele1 or tumor_allele2 != norm_allele2):
+                    raise ValueError(f"ERROR - When Validation_Status is invalid, the Tumor_Validation_Allele "
+                                     f"and Match_Norm_Validation_Allele columns should be equal.")
         
         return values
 
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Persistent cache for validation results of unchanged files
+import os
+import json
+import hashlib
+import logging
+
+# Schema modules each validation stage depends on. Editing one of these files changes the
+# fingerprint of the stages that use it, so their cached results are no longer found.
+STAGE_SCHEMA_FILES = {
+    'meta': ['validateMeta.py', 'cerberus_schemas.py'],
+    'data': ['validateData.py', 'mut_rules.py', 'sample_registry.py', 'pandera_schemas.py', 'pandera_checks.py', 'pydantic_schemas.py', 'data_reader.py', 'error_sink.py', 'gene_table.py', 'seg_validation.py', 'clinical_validation.py', 'cna_validation.py', 'expression_validation.py', 'sv_validation.py', 'gene_panel_validation.py', 'timeline_validation.py', 'generic_assay_validation.py'],
+}
+
+SCHEMA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Reference data a validation stage checks against, which is part of its fingerprint as well
+def gene_reference_version():
+    # Only imported for the data stage, which has imported the gene table module already
+    import gene_table
+    return gene_table.get_snapshot_version() or ''
+
+STAGE_REFERENCE_VERSIONS = {
+    'data': [gene_reference_version],
+}
+
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024 # 512 MB
+
+# Function to hash the content of a file, read in blocks to keep memory use constant
+def file_digest(file_path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Function to fingerprint the schemas of a validation stage
+def schema_fingerprint(stage):
+    digest = hashlib.sha256(stage.encode())
+    for schema_file in STAGE_SCHEMA_FILES[stage]:
+        digest.update(file_digest(os.path.join(SCHEMA_DIR, schema_file)).encode())
+    for reference_version in STAGE_REFERENCE_VERSIONS.get(stage, []):
+        digest.update(reference_version().encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """On-disk cache of validation results, keyed by the content hash of the validated file
+    (and of any files its validation depends on) plus the fingerprint of the schemas of the stage.
+    Each result is stored as a JSON file; when the cache grows beyond max_size bytes,
+    the least recently used entries are evicted."""
+
+    def __init__(self, cache_dir, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._fingerprints = {}
+        self._size = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def __getstate__(self):
+        # Only the location and limit are shared with worker processes, each worker
+        # computes the fingerprints and cache size itself
+        return {'cache_dir': self.cache_dir, 'max_size': self.max_size}
+
+    def __setstate__(self, state):
+        self.__init__(state['cache_dir'], state['max_size'])
+
+    def key(self, stage, file_path, depends_on=(), options=()):
+        if stage not in self._fingerprints:
+            self._fingerprints[stage] = schema_fingerprint(stage)
+        digest = hashlib.sha256(self._fingerprints[stage].encode())
+        for path in (file_path, *depends_on):
+            digest.update(file_digest(path).encode())
+        # Options that change the result (e.g. the number of failure cases kept)
+        digest.update(repr(tuple(options)).encode())
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def get(self, key):
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'r') as entry:
+                result = json.load(entry)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        # Mark the entry as recently used
+        os.utime(entry_path)
+        return result
+
+    def put(self, key, result):
+        entry_path = self._entry_path(key)
+        # Write to a temporary file first, so concurrent workers never read a partial entry
+        tmp_path = f'{entry_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as entry:
+            json.dump(result, entry)
+        os.replace(tmp_path, entry_path)
+
+        if self._size is None:
+            self._size = self._disk_usage()
+        else:
+            self._size += os.path.getsize(entry_path)
+        if self._size > self.max_size:
+            self.evict()
+
+    def cached(self, stage, file_path, validate, depends_on=(), options=()):
+        """Returns the stored result for the file when present, otherwise runs validate() and stores its result."""
+        key = self.key(stage, file_path, depends_on, options)
+        result = self.get(key)
+        if result is not None:
+            logging.info(f'Using cached {stage} validation result for {file_path}.')
+            return result
+        result = validate()
+        self.put(key, result)
+        return result
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.cache_dir) as scan:
+            for entry in scan:
+                if entry.name.endswith('.json'):
+                    try:
+                        stat_result = entry.stat()
+                    except FileNotFoundError: # evicted by another process
+                        continue
+                    entries.append((stat_result.st_mtime_ns, stat_result.st_size, entry.path))
+        return entries
+
+    def _disk_usage(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        # Remove least recently used entries until the cache fits in its size limit again
+        entries = sorted(self._entries())
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, entry_path in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        self._size = size
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Study-level registry of the sample and patient IDs defined in the clinical sample file
+import os
+import pandas as pd
+import data_reader
+import validateMeta
+
+# Column with the sample IDs per data file type
+SAMPLE_ID_COLUMNS = {
+    'MUTATION': 'Tumor_Sample_Barcode',
+    'SEG': 'ID',
+    'STRUCTURAL_VARIANT': 'Sample_Id',
+}
+
+
+class SampleRegistry:
+    """Sample IDs of a study with the patient of each sample, read once from the clinical sample file.
+    The sample IDs are kept in a hashed index, so the sample IDs of a data file are checked against
+    it with one vectorized isin."""
+
+    def __init__(self, sample_ids, patient_ids, file_path=None):
+        self.file_path = file_path
+        samples = pd.DataFrame({'SAMPLE_ID': sample_ids, 'PATIENT_ID': patient_ids})
+        duplicated = samples['SAMPLE_ID'].duplicated()
+        # The first definition of a duplicate sample ID is kept, duplicates are reported by the clinical validator
+        self.sample_patients = samples[~duplicated].set_index('SAMPLE_ID')['PATIENT_ID']
+        self.sample_ids = self.sample_patients.index
+        self.patient_ids = frozenset(self.sample_patients.dropna())
+
+    @classmethod
+    def from_clinical_file(cls, file_path):
+        samples = data_reader.read_data_file(file_path, columns={'SAMPLE_ID', 'PATIENT_ID'},
+                                             dtype={'SAMPLE_ID': str, 'PATIENT_ID': str})
+        if 'SAMPLE_ID' not in samples.columns:
+            raise Exception(f"No SAMPLE_ID column found in {file_path}.")
+        patient_ids = samples['PATIENT_ID'] if 'PATIENT_ID' in samples.columns else None
+        return cls(samples['SAMPLE_ID'].str.strip(), patient_ids.str.strip() if patient_ids is not None else None,
+                   file_path=file_path)
+
+    def check_sample_ids(self, sample_ids):
+        """Returns the sample IDs of a file that are not defined in the clinical sample file (unknown),
+        the defined samples that do not occur in the file (missing), and the samples of the file
+        that are defined without a patient (orphaned)."""
+        file_sample_ids = pd.Index(pd.Series(sample_ids).dropna().unique())
+        defined = file_sample_ids.isin(self.sample_ids)
+        patients = self.sample_patients.reindex(file_sample_ids[defined])
+        return {
+            'unknown': file_sample_ids[~defined].tolist(),
+            'missing': self.sample_ids[~self.sample_ids.isin(file_sample_ids)].tolist(),
+            'orphaned': patients.index[patients.isna().to_numpy()].tolist(),
+        }
+
+
+def get_sample_registry(study_dir, meta):
+    """Builds the sample registry of a study from the data file of its (first) clinical sample meta file."""
+    sample_meta_paths = validateMeta.get_meta_paths(meta, 'SAMPLE_ATTRIBUTES')
+    if not sample_meta_paths:
+        raise Exception("No clinical sample meta file found, sample IDs cannot be checked.")
+    meta_dict, _ = validateMeta.get_parsed_meta(sample_meta_paths[0])
+    return SampleRegistry.from_clinical_file(os.path.join(study_dir, meta_dict['data_filename']))
+
+def read_case_list_ids(case_list_path):
+    meta_dict, _ = validateMeta.get_parsed_meta(case_list_path)
+    return [sample_id.strip() for sample_id in meta_dict.get('case_list_ids', '').split('\t') if sample_id.strip()]
+
+def check_study_samples(study_dir, meta, registry, file_paths=None):
+    """Checks the sample IDs of the data files with a sample ID column and of the case lists
+    (only those in file_paths, when given) against the registry. Returns the unknown, missing
+    and orphaned samples per file."""
+    results = {}
+    for meta_path, meta_file_type in meta.items():
+        if meta_file_type not in SAMPLE_ID_COLUMNS:
+            continue
+        sample_id_column = SAMPLE_ID_COLUMNS[meta_file_type]
+        meta_dict, _ = validateMeta.get_parsed_meta(meta_path)
+        data_path = os.path.join(study_dir, meta_dict['data_filename'])
+        if file_paths is not None and data_path not in file_paths:
+            continue
+        # Only the sample ID column is read
+        data_df = data_reader.read_data_file(data_path, columns={sample_id_column}, dtype={sample_id_column: str})
+        if sample_id_column not in data_df.columns:
+            # A missing sample ID column is reported by the validator of the data file
+            continue
+        results[data_path] = registry.check_sample_ids(data_df[sample_id_column].str.strip())
+
+    case_list_dir = os.path.join(study_dir, 'case_lists')
+    if os.path.isdir(case_list_dir):
+        for case_list_file in sorted(os.listdir(case_list_dir)):
+            if case_list_file.startswith('.'):
+                continue
+            case_list_path = os.path.join(case_list_dir, case_list_file)
+            if file_paths is not None and case_list_path not in file_paths:
+                continue
+            results[case_list_path] = registry.check_sample_ids(read_case_list_ids(case_list_path))
+    return results
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Validation of segmented copy number (SEG) data files
+"""The columns of a SEG file are parsed into numpy columns and every check is a whole-column
+operation. Overlapping segments of a sample are found by sorting the segments on (sample,
+chromosome, start) once and comparing each start with the furthest end of the segments before it."""
+
+import numpy as np
+import pandas as pd
+import data_reader
+from error_sink import check_records, file_record
+from pydantic_schemas import chrom_sizes
+
+SEG_COLUMNS = ['ID', 'chrom', 'loc.start', 'loc.end', 'num.mark', 'seg.mean']
+# All columns are read as strings, the numeric columns are parsed afterwards so that
+# non-numeric values can be reported instead of failing the read
+SEG_DTYPES = {column: str for column in SEG_COLUMNS}
+NUMERIC_COLUMNS = ['loc.start', 'loc.end', 'num.mark', 'seg.mean']
+
+# Genome builds of the meta file per key of chrom_sizes
+GENOME_ALIASES = {'GRCh37': 'hg19', 'GRCh38': 'hg38', 'GRCm38': 'mm10'}
+DEFAULT_GENOME = 'hg19'
+
+# Chromosome names are compared without 'chr' prefix, and 23/24 are the numeric names of X/Y
+CHROMOSOME_ALIASES = {'23': 'X', '24': 'Y'}
+
+
+def get_chromosome_lengths(reference_genome_id):
+    genome = GENOME_ALIASES.get(reference_genome_id, reference_genome_id or DEFAULT_GENOME)
+    if genome not in chrom_sizes:
+        raise Exception(f"Unknown reference_genome_id {reference_genome_id}, expected one of {', '.join(chrom_sizes)}.")
+    return pd.Series(chrom_sizes[genome], dtype='float64')
+
+def normalize_chromosomes(chromosomes):
+    chromosomes = chromosomes.str.strip().str.replace(r'^chr', '', case=False, regex=True)
+    return chromosomes.replace(CHROMOSOME_ALIASES)
+
+def find_overlapping_segments(sample_ids, chromosomes, starts, ends):
+    """Returns a mask of the segments that start before a previous segment of the same sample
+    and chromosome ends. The segments are sorted once on (sample, chromosome, start)."""
+    sample_codes, _ = pd.factorize(sample_ids)
+    chromosome_codes, _ = pd.factorize(chromosomes)
+    order = np.lexsort((starts, chromosome_codes, sample_codes))
+    sorted_samples, sorted_chromosomes = sample_codes[order], chromosome_codes[order]
+    sorted_starts, sorted_ends = starts[order], ends[order]
+
+    # Furthest end of the earlier segments of the same sample and chromosome
+    group_start = np.ones(len(order), dtype=bool)
+    group_start[1:] = (sorted_samples[1:] != sorted_samples[:-1]) | (sorted_chromosomes[1:] != sorted_chromosomes[:-1])
+    furthest_end = pd.Series(sorted_ends).groupby(np.cumsum(group_start)).cummax().to_numpy()
+    previous_end = np.empty(len(order))
+    previous_end[0:1] = np.nan
+    previous_end[1:] = furthest_end[:-1]
+    previous_end[group_start] = np.nan
+
+    overlapping = np.zeros(len(order), dtype=bool)
+    overlapping[order] = sorted_starts < previous_end
+    return overlapping
+
+def validate_seg_dataframe(seg_df, reference_genome_id=None, data_file=None):
+    """Validates the segments of a SEG file. Returns one report record per failed check."""
+    missing_columns = [column for column in SEG_COLUMNS if column not in seg_df.columns]
+    if missing_columns:
+        return [file_record(f"ERROR - Missing required column(s) in SEG file: {', '.join(missing_columns)}.", data_file=data_file)]
+
+    chromosome_lengths = get_chromosome_lengths(reference_genome_id)
+    sample_ids = seg_df['ID'].str.strip()
+    chromosomes = normalize_chromosomes(seg_df['chrom'])
+    numbers = {column: pd.to_numeric(seg_df[column], errors='coerce').to_numpy(dtype='float64') for column in NUMERIC_COLUMNS}
+    starts, ends, marks = numbers['loc.start'], numbers['loc.end'], numbers['num.mark']
+
+    missing_start, missing_end = np.isnan(starts), np.isnan(ends)
+    positions_known = ~missing_start & ~missing_end
+    lengths = chromosomes.map(chromosome_lengths).to_numpy(dtype='float64')
+    known_chromosome = ~np.isnan(lengths)
+    checks = [
+        ('ID', "ERROR - Missing sample ID.", sample_ids.isna().to_numpy(), None),
+        ('chrom', f"ERROR - Chromosome not found in the genome {reference_genome_id or DEFAULT_GENOME}.",
+         ~known_chromosome, seg_df['chrom']),
+        # np.mod is NaN for missing values, so these fail as well
+        ('loc.start', "ERROR - loc.start is missing or not an integer.", np.mod(starts, 1) != 0, seg_df['loc.start']),
+        ('loc.end', "ERROR - loc.end is missing or not an integer.", np.mod(ends, 1) != 0, seg_df['loc.end']),
+        ('loc.start', "ERROR - loc.start should be smaller than or equal to loc.end.",
+         positions_known & (starts > ends), starts),
+        ('loc.end', "ERROR - loc.end is beyond the end of the chromosome.",
+         positions_known & known_chromosome & (ends > lengths), ends),
+        ('num.mark', "WARNING - num.mark is not a positive integer.",
+         seg_df['num.mark'].notna().to_numpy() & ~((marks > 0) & (np.mod(marks, 1) == 0)), seg_df['num.mark']),
+        ('seg.mean', "ERROR - seg.mean is missing or not a number.", ~np.isfinite(numbers['seg.mean']), seg_df['seg.mean']),
+    ]
+
+    comparable = positions_known & sample_ids.notna().to_numpy() & known_chromosome
+    overlapping = np.zeros(len(seg_df), dtype=bool)
+    overlapping[comparable] = find_overlapping_segments(sample_ids[comparable], chromosomes[comparable],
+                                                        starts[comparable], ends[comparable])
+    checks.append(('loc.start', "ERROR - Segment overlaps with a previous segment of the same sample.", overlapping, sample_ids))
+    return check_records(checks, data_file=data_file)
+
+def validate_seg_file(file_path, meta_dict=None, cache=None, **kwargs):
+    """Validates a SEG file against the genome of its meta file (reference_genome_id, hg19 by default)."""
+    reference_genome_id = (meta_dict or {}).get('reference_genome_id')
+
+    def validate():
+        seg_df = data_reader.read_data_file(file_path, columns=set(SEG_COLUMNS), dtype=SEG_DTYPES)
+        return validate_seg_dataframe(seg_df, reference_genome_id=reference_genome_id, data_file=file_path)
+
+    if cache is not None:
+        return cache.cached('data', file_path, validate, options=(reference_genome_id,))
+    return validate()
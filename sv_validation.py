@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Validation of structural variant (SV) data files
+"""An SV file has a row per structural variant with the gene, chromosome and position of both
+breakpoints (Site1_ and Site2_ columns). As for SEG files, every check is a whole-column operation:
+the chromosomes are mapped to their lengths in the genome of the study, and the genes of a site are
+looked up in the gene table with one isin per column."""
+
+import numpy as np
+import pandas as pd
+import data_reader
+import gene_table
+import validateMeta
+from error_sink import check_records, file_record
+from seg_validation import DEFAULT_GENOME, GENOME_ALIASES, get_chromosome_lengths, normalize_chromosomes
+
+REQUIRED_COLUMNS = ['Sample_Id', 'SV_Status']
+SITES = ['Site1', 'Site2']
+SITE_COLUMNS = ['Hugo_Symbol', 'Entrez_Gene_Id', 'Chromosome', 'Position']
+SV_COLUMNS = REQUIRED_COLUMNS + ['Class'] + [f'{site}_{column}' for site in SITES for column in SITE_COLUMNS]
+
+SV_STATUS_VALUES = ['SOMATIC', 'GERMLINE']
+CLASS_VALUES = ['DELETION', 'DUPLICATION', 'INSERTION', 'INVERSION', 'TRANSLOCATION']
+
+
+def get_column(sv_df, column):
+    """Returns a column as stripped strings, all missing when the file does not have it."""
+    if column not in sv_df.columns:
+        return pd.Series(np.nan, index=sv_df.index, dtype=object)
+    return sv_df[column].str.strip().replace('', np.nan)
+
+def site_checks(sv_df, site, chromosome_lengths, genes=None, genome=DEFAULT_GENOME):
+    """Returns the (field, message, mask, values) checks of the breakpoint of a site and a mask of the rows that have a gene at the site."""
+    hugo_symbols = get_column(sv_df, f'{site}_Hugo_Symbol')
+    entrez_column = get_column(sv_df, f'{site}_Entrez_Gene_Id')
+    entrez_ids = pd.to_numeric(entrez_column, errors='coerce').to_numpy(dtype='float64')
+    chromosome_column = get_column(sv_df, f'{site}_Chromosome')
+    position_column = get_column(sv_df, f'{site}_Position')
+    positions = pd.to_numeric(position_column, errors='coerce').to_numpy(dtype='float64')
+    lengths = normalize_chromosomes(chromosome_column).map(chromosome_lengths).to_numpy(dtype='float64')
+
+    has_chromosome = chromosome_column.notna().to_numpy()
+    has_position = position_column.notna().to_numpy()
+    has_gene = hugo_symbols.notna().to_numpy() | ~np.isnan(entrez_ids)
+    checks = [
+        (f'{site}_Entrez_Gene_Id', "ERROR - Entrez gene ID is not an integer.",
+         entrez_column.notna().to_numpy() & (np.mod(entrez_ids, 1) != 0), entrez_column),
+        (f'{site}_Chromosome', f"ERROR - Chromosome not found in the genome {genome}.",
+         has_chromosome & np.isnan(lengths), chromosome_column),
+        (f'{site}_Position', "ERROR - Position is not a positive integer.",
+         has_position & ~((positions > 0) & (np.mod(positions, 1) == 0)), position_column),
+        (f'{site}_Position', "ERROR - Position is beyond the end of the chromosome.", positions > lengths, positions),
+        (f'{site}_Chromosome', "ERROR - Chromosome and position should both be given or both be missing.",
+         has_chromosome != has_position, chromosome_column),
+    ]
+    if genes is not None:
+        checks.append((f'{site}_Hugo_Symbol', "WARNING - Gene is not known to the cBioPortal instance.",
+                       has_gene & ~genes.known_genes(hugo_symbols, entrez_ids), hugo_symbols.fillna(entrez_column)))
+    return checks, has_gene
+
+def validate_sv_dataframe(sv_df, reference_genome_id=None, genes=None, data_file=None):
+    """Validates the variants of an SV file. Returns one report record per failed check."""
+    missing_columns = [column for column in REQUIRED_COLUMNS if column not in sv_df.columns]
+    if missing_columns:
+        return [file_record(f"ERROR - Missing required column(s) in SV file: {', '.join(missing_columns)}.", data_file=data_file)]
+
+    chromosome_lengths = get_chromosome_lengths(reference_genome_id)
+    sv_status = get_column(sv_df, 'SV_Status')
+    event_class = get_column(sv_df, 'Class')
+    checks = [
+        ('Sample_Id', "ERROR - Missing sample ID.", get_column(sv_df, 'Sample_Id').isna().to_numpy(), None),
+        ('SV_Status', f"ERROR - SV_Status is not one of {', '.join(SV_STATUS_VALUES)}.",
+         ~sv_status.str.upper().isin(SV_STATUS_VALUES).to_numpy(), sv_status),
+        ('Class', f"ERROR - Class is not one of {', '.join(CLASS_VALUES)}.",
+         event_class.notna().to_numpy() & ~event_class.str.upper().isin(CLASS_VALUES).to_numpy(), event_class),
+    ]
+    has_gene = np.zeros(len(sv_df), dtype=bool)
+    for site in SITES:
+        checks_of_site, has_site_gene = site_checks(sv_df, site, chromosome_lengths, genes=genes,
+                                                    genome=reference_genome_id or DEFAULT_GENOME)
+        checks.extend(checks_of_site)
+        has_gene |= has_site_gene
+    checks.append(('Site1_Hugo_Symbol', "ERROR - No gene (Hugo symbol or Entrez gene ID) given for either site.", ~has_gene, None))
+    return check_records(checks, data_file=data_file)
+
+def get_study_genome(study_meta):
+    """Returns the genome of the study (reference_genome of meta_study, hg19 by default), e.g. GRCh38 as hg38."""
+    study_meta_paths = validateMeta.get_meta_paths(study_meta or {}, 'STUDY')
+    reference_genome = None
+    if study_meta_paths:
+        meta_dict, _ = validateMeta.get_parsed_meta(study_meta_paths[0])
+        reference_genome = meta_dict.get('reference_genome')
+    reference_genome = reference_genome or DEFAULT_GENOME
+    return GENOME_ALIASES.get(reference_genome, reference_genome)
+
+def validate_sv_file(file_path, meta_dict=None, cache=None, study_meta=None, **kwargs):
+    """Validates an SV file against the genome of the study. SV meta files have no reference_genome_id,
+    the genome is taken from meta_study."""
+    reference_genome_id = get_study_genome(study_meta)
+
+    def validate():
+        sv_df = data_reader.read_data_file(file_path, columns=set(SV_COLUMNS), dtype={column: str for column in SV_COLUMNS})
+        return validate_sv_dataframe(sv_df, reference_genome_id=reference_genome_id, genes=gene_table.get_gene_table(),
+                                     data_file=file_path)
+
+    if cache is not None:
+        return cache.cached('data', file_path, validate, options=(reference_genome_id,))
+    return validate()
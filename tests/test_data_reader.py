@@ -0,0 +1,31 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import data_reader
+
+pytest.importorskip('pyarrow')
+
+
+def test_pandas_fallback_reads_the_same_frame(tmp_path, monkeypatch):
+    data_path = tmp_path / 'data.txt'
+    data_path.write_text('#genome_nexus_version: 1\n#comment\n'
+                         'Hugo_Symbol\tNote\tValue\n'
+                         'TP53\tvariant #1\tNone\n'
+                         'BRCA1\t<NA>\t1.5\n'
+                         '#KRAS\tNA\t\n')
+    dtype = {'Hugo_Symbol': str, 'Note': str, 'Value': 'float64'}
+    arrow_df = data_reader.read_data_file(str(data_path), columns={'Hugo_Symbol', 'Note', 'Value'}, dtype=dtype)
+    monkeypatch.setattr(data_reader, 'pa', None)
+    pandas_df = data_reader.read_data_file(str(data_path), columns={'Hugo_Symbol', 'Note', 'Value'}, dtype=dtype)
+    # Only the comment lines before the header are skipped, a '#' in the body is data
+    assert pandas_df['Hugo_Symbol'].tolist() == ['TP53', 'BRCA1', '#KRAS']
+    assert pandas_df.loc[0, 'Note'] == 'variant #1'
+    assert pandas_df['Note'].isna().tolist() == [False, True, True]
+    assert pandas_df['Value'].isna().tolist() == [True, False, True]
+    pd.testing.assert_frame_equal(pandas_df.astype(object).where(pandas_df.notna(), None),
+                                  arrow_df.astype(object).where(arrow_df.notna(), None))
@@ -0,0 +1,55 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import error_sink
+
+
+def test_add_row_ranges():
+    ranges = []
+    error_sink.add_row_ranges(ranges, np.array([], dtype='int64'))
+    assert ranges == []
+    error_sink.add_row_ranges(ranges, np.array([0, 1, 2, 5, 7, 8]))
+    assert ranges == [[0, 2], [5, 5], [7, 8]]
+    # The first new range is merged with the last range when it is adjacent or overlaps
+    error_sink.add_row_ranges(ranges, np.array([9, 10, 20]))
+    assert ranges == [[0, 2], [5, 5], [7, 10], [20, 20]]
+    error_sink.add_row_ranges(ranges, np.array([20, 22]))
+    assert ranges == [[0, 2], [5, 5], [7, 10], [20, 20], [22, 22]]
+    assert error_sink.format_row_ranges(ranges) == '0-2, 5, 7-10, 20, 22'
+
+def test_add_rows_across_chunks():
+    checks = error_sink.RowCheckCounter(data_file='data.txt')
+    # Chunks of 10 rows, with failures that continue over the chunk boundaries
+    checks.add_mask('A', "ERROR - Bad value.", np.arange(10) >= 7, [f'v{row}' for row in range(10)], offset=0)
+    checks.add_mask('A', "ERROR - Bad value.", np.arange(10) < 2, [f'v{row}' for row in range(10, 20)], offset=10)
+    checks.add_mask('A', "ERROR - Bad value.", np.zeros(10, dtype=bool), offset=20)
+    checks.add_rows('A', "ERROR - Bad value.", np.array([30, 31]), ['v30', None], count=5)
+    checks.add('B', "WARNING - Odd value.", 3, 'x')
+    checks.add('B', "WARNING - Odd value.", 4, 'x')
+    checks.add('B', "WARNING - Odd value.", 6, 'y')
+
+    records = {record['column']: record for record in checks.records()}
+    assert records['A']['rows'] == '7-11, 30-31'
+    assert records['A']['count'] == 10
+    assert records['A']['samples'] == ['v7', 'v8', 'v9', 'v10', 'v11']
+    assert records['B']['rows'] == '3-4, 6'
+    assert (records['B']['count'], records['B']['samples'], records['B']['severity']) == (3, ['x', 'y'], 'WARNING')
+
+def test_failure_case_sink_merges_chunks(tmp_path):
+    def failure_cases(rows):
+        return pd.DataFrame({'schema_context': 'Column', 'column': 'A', 'check': 'not_nullable',
+                             'check_number': 0, 'failure_case': None, 'index': rows})
+
+    with error_sink.FailureCaseSink(str(tmp_path / 'failure_cases.txt'), max_examples=3, data_file='data.txt') as sink:
+        sink.add(failure_cases([8, 9]))
+        sink.add(failure_cases([10, 12]))
+    [record] = sink.report()
+    assert (record['rows'], record['count'], record['samples']) == ('8-10, 12', 4, [None])
+    # Only max_examples failure cases are written
+    assert len(pd.read_csv(tmp_path / 'failure_cases.txt', sep='\t')) == 3
+    assert (tmp_path / 'failure_summary.txt').read_text().startswith('ERROR - data.txt: A: not_nullable: 4 failure(s) in rows 8-10, 12')
@@ -0,0 +1,43 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import gene_panel_validation
+import gene_table
+
+
+@pytest.fixture
+def genes(tmp_path):
+    genes_df = pd.DataFrame({'hugoGeneSymbol': ['TP53', 'KRAS', 'BRCA1', 'EGFR'], 'entrezGeneId': [7157, 3845, 672, 1956]})
+    aliases_df = pd.DataFrame({'gene_alias': ['P53', 'RASK2', 'AMBIG', 'AMBIG'], 'entrezGeneId': [7157, 3845, 672, 1956]})
+    gene_table.write_snapshot(str(tmp_path / 'v1'), genes_df, aliases_df, 'v1', 'test')
+    return gene_table.GeneTable(str(tmp_path / 'v1'))
+
+def test_gene_entrez_ids(genes):
+    resolved = genes.gene_entrez_ids(pd.Series(['tp53', 'RASK2', 'AMBIG', 'NOPE', None, 'KRAS', 'KRAS']),
+                                     [np.nan, np.nan, np.nan, np.nan, 672, 1.5, 99])
+    # Given Entrez gene IDs win over the symbol, an alias of two genes does not identify a gene
+    np.testing.assert_array_equal(resolved, [7157, 3845, np.nan, np.nan, 672, np.nan, np.nan])
+
+def test_mutation_coverage_by_entrez_id(genes):
+    # The panel lists a symbol, an alias and an Entrez gene ID
+    panels = gene_panel_validation.GenePanels({'PANEL': {'TP53', 'RASK2', '672', 'UNKNOWN_GENE'}}, genes)
+    assert gene_panel_validation.validate_panel_genes(panels)[0]['check'].endswith(': UNKNOWN_GENE')
+
+    maf_df = pd.DataFrame({
+        'Tumor_Sample_Barcode': ['S1'] * 7,
+        'Hugo_Symbol': ['P53', 'KRAS', None, 'BRCA1', 'EGFR', None, 'NOPE'],
+        'Entrez_Gene_Id': [None, '3845', '672', '0', None, '0', None],
+    })
+    records = gene_panel_validation.check_mutation_coverage(maf_df, pd.Series({'S1': 'PANEL'}), panels, genes)
+    # Only EGFR is not covered; rows without a (known) gene are not checked
+    assert [(record['rows'], record['samples']) for record in records] == [('4', ['EGFR'])]
+
+    entrez_only = maf_df.drop(columns='Hugo_Symbol')
+    records = gene_panel_validation.check_mutation_coverage(entrez_only, pd.Series({'S1': 'PANEL'}), panels, genes)
+    assert records == []
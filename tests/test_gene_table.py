@@ -0,0 +1,55 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import gene_table
+import validateData
+
+MAF_PATH = os.path.join(REPO_DIR, 'sample_data', 'brca_jup_msk_2020', 'data_mutations.txt')
+
+
+@pytest.fixture(params=['with_orders', 'without_orders'])
+def genes(tmp_path, request):
+    genes_df = pd.DataFrame({'hugoGeneSymbol': ['TP53', 'KRAS', 'DUP', 'DUP', 'BRCA1'], 'entrezGeneId': [7157, 3845, 1, 2, 672]})
+    aliases_df = pd.DataFrame({'gene_alias': ['P53', 'RASK2', 'P53'], 'entrezGeneId': [7157, 3845, 1]})
+    gene_table.write_snapshot(str(tmp_path / 'v1'), genes_df, aliases_df, 'v1', 'test')
+    if request.param == 'without_orders':
+        # Snapshots written before the sort orders were stored
+        for order_name in gene_table.SORT_ORDERS.values():
+            os.remove(tmp_path / 'v1' / f'{order_name}.npy')
+    return gene_table.GeneTable(str(tmp_path / 'v1'))
+
+def test_lookups(genes):
+    assert genes.entrez_id('TP53') == 7157
+    # The first row of a symbol wins
+    assert genes.entrez_id('DUP') == 1
+    assert genes.entrez_id('TP5') is None and genes.entrez_id('TP53X') is None
+    assert genes.hugo_symbol(672) == 'BRCA1' and genes.hugo_symbol(9999) is None
+    assert genes.alias_entrez_ids('P53') == [7157, 1]
+    assert genes.alias_entrez_ids('NOPE') == []
+    assert genes.has_gene(hugo_symbol='rask2') and not genes.has_gene(hugo_symbol='NOPE')
+
+def test_column_lookups(genes):
+    symbols = pd.Series(['tp53', None, 'DUP', 'A_SYMBOL_LONGER_THAN_ANY_IN_THE_TABLE', 'BRCA1', 'P53'])
+    assert genes.has_symbols(symbols).tolist() == [True, False, True, False, True, False]
+    np.testing.assert_array_equal(genes.symbol_entrez_ids(symbols), [7157, np.nan, 1, np.nan, 672, np.nan])
+    assert genes.has_entrez_ids(np.array([7157, 0, 2])).tolist() == [True, False, True]
+    known = genes.known_genes(symbols, np.array([np.nan, 3845, np.nan, np.nan, 672.5, np.nan]))
+    assert known.tolist() == [True, True, True, False, False, True]
+
+def test_mutations_without_snapshot(tmp_path, monkeypatch):
+    def no_snapshot():
+        raise FileNotFoundError('No gene reference snapshot found.')
+    monkeypatch.setattr(gene_table, 'get_gene_table', no_snapshot)
+    records = validateData.validate_mutation_file(MAF_PATH, report_dir=str(tmp_path))
+    checks = [record['check'] for record in records]
+    assert 'WARNING - The genes of the mutations are not checked: No gene reference snapshot found.' in checks
+    # The Pandera checks and the row-level checks that do not need the genes still run
+    assert 'not_nullable' in checks
+    assert any(check.startswith('ERROR - Variant_Type indicates deletion') for check in checks)
+    assert not any('not known to the cBioPortal instance' in check for check in checks)
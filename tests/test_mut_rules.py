@@ -0,0 +1,113 @@
+import os
+import sys
+import pandas as pd
+import pytest
+from pydantic import validate_model
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import gene_table
+import mut_rules
+import pandera_schemas
+import pydantic_schemas
+import validateData
+from error_sink import get_severity
+
+MAF_PATH = os.path.join(REPO_DIR, 'sample_data', 'brca_jup_msk_2020', 'data_mutations.txt')
+
+
+@pytest.fixture
+def genes(tmp_path, monkeypatch):
+    """Gene table of the genes of the sample MAF, without its first gene and with another Entrez ID for its second gene."""
+    maf_df = pd.read_csv(MAF_PATH, sep='\t', comment='#', usecols=['Hugo_Symbol', 'Entrez_Gene_Id'])
+    genes_df = maf_df.drop_duplicates('Hugo_Symbol').rename(columns={'Hugo_Symbol': 'hugoGeneSymbol', 'Entrez_Gene_Id': 'entrezGeneId'})
+    genes_df = genes_df.iloc[1:].reset_index(drop=True)
+    genes_df.loc[0, 'entrezGeneId'] += 1000000
+    aliases_df = pd.DataFrame({'gene_alias': ['P53'], 'entrezGeneId': [7157]})
+    gene_table.write_snapshot(str(tmp_path / 'v1'), genes_df, aliases_df, 'v1', 'test')
+    table = gene_table.GeneTable(str(tmp_path / 'v1'))
+    monkeypatch.setattr(gene_table, '_gene_table', table)
+    return table
+
+def read_maf():
+    return validateData.parse_file_to_dataframe(MAF_PATH, dtype=validateData.get_read_dtypes(pandera_schemas.mut_schema),
+                                                columns=validateData.MUT_COLUMNS)
+
+def edit_rows(maf_df):
+    """Returns the sample MAF with rows edited to fail the root validators, normalized."""
+    maf_df = maf_df.astype(object)
+    edits = [
+        {'Hugo_Symbol': None, 'Entrez_Gene_Id': None, 'Variant_Classification': 'IGR'},
+        {'Hugo_Symbol': None, 'Entrez_Gene_Id': None},
+        {'Hugo_Symbol': '1ABC', 'Variant_Classification': 'Silent'},
+        {'Validation_Status': 'Valid', 'Validation_Method': 'none'},
+        {'Validation_Status': 'Invalid', 'Tumor_Validation_Allele1': 'A', 'Tumor_Validation_Allele2': 'A',
+         'Match_Norm_Validation_Allele1': 'C', 'Match_Norm_Validation_Allele2': 'C'},
+        {'Validation_Status': 'Valid', 'Mutation_Status': 'Germline', 'Tumor_Validation_Allele1': 'A', 'Tumor_Validation_Allele2': 'X',
+         'Match_Norm_Validation_Allele1': 'A', 'Match_Norm_Validation_Allele2': 'A'},
+        {'Start_Position': 200, 'End_Position': 100},
+        {'HGVSp_Short': None},
+        {'Variant_Type': 'SNP', 'Reference_Allele': 'AC'},
+        {'Reference_Allele': 'N', 'Tumor_Seq_Allele1': 'N', 'Tumor_Seq_Allele2': 'N'},
+        {'Tumor_Sample_Barcode': None},
+        {'t_ref_count': 'x', 'Entrez_Gene_Id': ' 7157 '},
+        {'Hugo_Symbol': ' p53 ', 'Entrez_Gene_Id': None},
+    ]
+    for row, edit in enumerate(edits):
+        for column, value in edit.items():
+            maf_df.at[row, column] = value
+    return validateData.normalize_mutation_rows(maf_df)
+
+def model_errors(data_df):
+    columns = list(data_df.columns)
+    errors = []
+    for row, row_values in zip(data_df.index, data_df.itertuples(index=False, name=None)):
+        _, _, error = validate_model(pydantic_schemas.MutData, dict(zip(columns, row_values)))
+        if error is not None:
+            errors.extend((row, '.'.join(map(str, row_error['loc'])), row_error['msg'], row_error['type'], get_severity(row_error['msg']))
+                          for row_error in error.errors())
+    return errors
+
+def rule_errors(data_df, genes, sample_ids=None):
+    row_errors = mut_rules.validate_mutation_rows(data_df, genes=genes, sample_ids=sample_ids)
+    return list(row_errors.itertuples(index=False, name=None))
+
+def test_rules_match_mutdata_on_sample_maf(genes):
+    maf_df = validateData.normalize_mutation_rows(read_maf())
+    assert rule_errors(maf_df, genes) == model_errors(maf_df)
+
+def test_rules_match_mutdata_on_edited_rows(genes, monkeypatch):
+    maf_df = edit_rows(read_maf())
+    sample_ids = frozenset(maf_df['Tumor_Sample_Barcode'].dropna().unique()[1:])
+    monkeypatch.setattr(pydantic_schemas, 'SAMPLE_IDS', sample_ids)
+    errors = rule_errors(maf_df, genes, sample_ids)
+    assert errors == model_errors(maf_df)
+    messages = {message for _, _, message, _, _ in errors}
+    for message in [mut_rules.NO_GENES_INTERGENIC, mut_rules.NO_GENES_NOT_INTERGENIC, mut_rules.NO_HGVSP_SHORT,
+                    mut_rules.VALIDATION_ALLELES_EMPTY.format('Valid'), mut_rules.INVALID_ALLELES_DIFFER,
+                    mut_rules.VALIDATION_ALLELES_INVALID, mut_rules.SAMPLE_UNKNOWN, mut_rules.NONE_ERROR[0]]:
+        assert message in messages
+
+@pytest.mark.parametrize('chunksize', [None, 30])
+def test_sharded_row_checks_match_one_process(genes, tmp_path, chunksize):
+    records = validateData.validate_mutation_file(MAF_PATH, chunksize=chunksize, report_dir=str(tmp_path / 'one'))
+    sharded_records = validateData.validate_mutation_file(MAF_PATH, chunksize=chunksize, report_dir=str(tmp_path / 'sharded'), jobs=3)
+    assert sharded_records == records
+    assert any(record['schema_context'] == 'Column' and record['check'].startswith('WARNING - ') for record in records)
+
+def test_rules_match_mutdata_on_normalized_rows(genes):
+    maf_df = read_maf()
+    edits = [{'HGVSp_Short': 'nA', 't_ref_count': 0}, {'Hugo_Symbol': ' Unknown ', 'Entrez_Gene_Id': 0},
+             {'Variant_Classification': 'Unknown'}, {'Validation_Status': ' [Not Available] '}]
+    for row, edit in enumerate(edits):
+        for column, value in edit.items():
+            maf_df.at[row, column] = value
+    normalized_df = validateData.normalize_mutation_rows(maf_df)
+    assert normalized_df.loc[0, 'HGVSp_Short'] is None and normalized_df.loc[0, 't_ref_count'] == 0
+    assert normalized_df.loc[1, 'Hugo_Symbol'] is None and normalized_df.loc[1, 'Entrez_Gene_Id'] is None
+    assert normalized_df.loc[2, 'Variant_Classification'] == 'Unknown'
+    assert normalized_df.loc[3, 'Validation_Status'] is None
+    errors = rule_errors(normalized_df, genes)
+    assert errors == model_errors(normalized_df)
+    assert (0, '__root__', mut_rules.NO_HGVSP_SHORT, 'value_error', 'WARNING') in errors
@@ -0,0 +1,40 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import seg_validation
+
+
+def overlapping(segments):
+    sample_ids, chromosomes, starts, ends = zip(*segments)
+    return seg_validation.find_overlapping_segments(np.array(sample_ids), np.array(chromosomes),
+                                                    np.array(starts, dtype='float64'), np.array(ends, dtype='float64')).tolist()
+
+def test_touching_segments_do_not_overlap():
+    assert overlapping([('S1', '1', 100, 200), ('S1', '1', 200, 300), ('S1', '1', 300, 300)]) == [False, False, False]
+
+def test_equal_starts_overlap():
+    # The later segment in the file is the overlapping one
+    assert overlapping([('S1', '1', 100, 200), ('S1', '1', 100, 150)]) == [False, True]
+    assert overlapping([('S1', '1', 100, 150), ('S1', '1', 100, 200)]) == [False, True]
+
+def test_overlaps_within_sample_and_chromosome():
+    segments = [
+        ('S1', '1', 500, 600),
+        ('S1', '1', 100, 1000),  # Sorted before the first segment, which it contains
+        ('S1', '1', 700, 800),   # Overlaps the furthest end (1000), not the segment just before it
+        ('S2', '1', 150, 250),
+        ('S1', '2', 150, 250),
+    ]
+    assert overlapping(segments) == [True, False, True, False, False]
+
+def test_seg_dataframe_reports_overlaps():
+    seg_df = pd.DataFrame({'ID': ['S1', 'S1', 'S1'], 'chrom': ['chr1', '1', '1'], 'loc.start': ['100', '200', '150'],
+                           'loc.end': ['200', '300', '160'], 'num.mark': ['5', '5', '5'], 'seg.mean': ['0.1', '0.2', '0.3']})
+    records = seg_validation.validate_seg_dataframe(seg_df)
+    assert [(record['check'], record['rows']) for record in records] == [
+        ("ERROR - Segment overlaps with a previous segment of the same sample.", '2')]
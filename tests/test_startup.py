@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUDY_DIR = os.path.join(REPO_DIR, 'sample_data', 'brca_jup_msk_2020')
+
+# Runs the validateStudy command line in a fresh interpreter and prints the loaded modules afterwards
+RUN_CLI = """
+import runpy, sys
+sys.argv = ['validateStudy.py'] + sys.argv[1:]
+runpy.run_path('validateStudy.py', run_name='__main__')
+print('MODULES:' + ','.join(sorted(sys.modules)))
+"""
+
+def loaded_modules(*args):
+    result = subprocess.run([sys.executable, '-c', RUN_CLI, *args], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    line = next(line for line in result.stdout.splitlines() if line.startswith('MODULES:'))
+    return set(line[len('MODULES:'):].split(','))
+
+def test_structure_and_meta_stages_do_not_import_data_libraries():
+    modules = loaded_modules('-i', STUDY_DIR, '-s', 'structure,meta')
+    assert 'cerberus' in modules
+    for module in ['pandas', 'numpy', 'pandera', 'pydantic', 'validateData']:
+        assert module not in modules
+
+def test_data_stage_imports_data_libraries():
+    modules = loaded_modules('-i', STUDY_DIR, '-s', 'structure,meta,data')
+    assert {'pandas', 'pandera', 'pydantic', 'validateData'} <= modules
+
+# Budget for the imports of a structure and meta validation, in microseconds as reported by -X importtime
+# (importing pandas alone takes longer)
+STARTUP_IMPORT_BUDGET = 350000
+
+def import_time(*args):
+    """Returns the total time (in microseconds) of the top-level imports of a validateStudy run."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', 'validateStudy.py', *args], cwd=REPO_DIR,
+                            capture_output=True, text=True, check=True)
+    total = 0
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and not line.startswith('import time: self'):
+            _, cumulative, name = line[len('import time:'):].split('|')
+            # Nested imports are indented, their time is in the cumulative time of the top-level import
+            if not name.startswith('  '):
+                total += int(cumulative)
+    return total
+
+def test_structure_and_meta_startup_time():
+    # The best of a few runs, so a busy machine does not fail the check
+    assert min(import_time('-i', STUDY_DIR, '-s', 'structure,meta') for _ in range(3)) < STARTUP_IMPORT_BUDGET
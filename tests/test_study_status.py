@@ -0,0 +1,31 @@
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import validateData
+import validateStudy
+
+
+def record(severity):
+    return {'file': 'data_mutations.txt', 'schema_context': 'File', 'column': None, 'check': f'{severity} - Check.',
+            'severity': severity, 'count': 1, 'rows': '', 'samples': []}
+
+def test_only_error_records_fail_a_study(monkeypatch):
+    errors = {'data_mutations.txt': [record('WARNING'), record('INFO')]}
+    monkeypatch.setattr(validateStudy, 'validate_study', lambda input_dir, **kwargs: errors)
+    assert validateStudy.validate_study_summary('study')['status'] == 'PASSED'
+    errors['data_mutations.txt'].append(record('ERROR'))
+    assert validateStudy.validate_study_summary('study')['status'] == 'FAILED'
+    # Meta file errors (Cerberus) and unknown samples have no severity, they are errors
+    errors.clear()
+    errors['meta_study.txt'] = {'type_of_cancer': ['required field']}
+    assert validateStudy.validate_study_summary('study')['status'] == 'FAILED'
+
+def test_report_dirs_of_studies_with_the_same_name(tmp_path):
+    report_dirs = {validateData.get_report_dir(str(tmp_path / subtree / 'brca'), 'data_mutations.txt')
+                   for subtree in ['public', 'private']}
+    assert len(report_dirs) == 2
+    assert all(report_dir.startswith(validateData.REPORT_ROOT) and report_dir.endswith(os.path.join('brca', 'data_mutations'))
+               for report_dir in report_dirs)
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import timeline_validation
+
+
+def test_unordered_events_across_chunks():
+    patient_ids = np.array(['P1', 'P2', 'P1', 'P1', 'P2', 'P3', 'P1', 'P2'])
+    start_dates = np.array([0, 10, 5, 3, 20, 0, 3, 15], dtype='float64')
+    expected = [False, False, False, True, False, False, False, True]
+
+    whole, _ = timeline_validation.find_unordered_events(patient_ids, start_dates, pd.Series(dtype='float64'))
+    assert whole.tolist() == expected
+
+    # P1 and P2 span the chunk boundaries, their first event in a chunk is compared with the previous chunks
+    for chunksize in [1, 2, 3]:
+        unordered, last_start_dates = [], pd.Series(dtype='float64')
+        for start in range(0, len(patient_ids), chunksize):
+            chunk_unordered, last_start_dates = timeline_validation.find_unordered_events(
+                patient_ids[start:start + chunksize], start_dates[start:start + chunksize], last_start_dates)
+            unordered.extend(chunk_unordered.tolist())
+        assert unordered == expected
+        assert last_start_dates.to_dict() == {'P1': 3, 'P2': 15, 'P3': 0}
+
+def test_timeline_file_in_chunks(tmp_path):
+    timeline_path = tmp_path / 'data_timeline.txt'
+    timeline_path.write_text('#comment\nPATIENT_ID\tSTART_DATE\tSTOP_DATE\tEVENT_TYPE\tSTATUS\n'
+                             'P1\t10\t\tSTATUS\tA\nP1\t5\t\tSTATUS\tB#1\nP2\t0\t\tSTATUS\t\nP1\t7\t\tSTATUS#2\tC\n')
+    records = timeline_validation.validate_timeline_file(str(timeline_path), chunksize=1)
+    checks = {record['check']: record for record in records}
+    assert checks["WARNING - Event starts before the previous event of the same patient."]['rows'] == '1'
+    assert checks["WARNING - Missing STATUS, expected for STATUS events."]['rows'] == '2'
+    # A '#' after the header is part of the value
+    assert checks[f"WARNING - Unknown event type, expected one of {', '.join(timeline_validation.EVENT_TYPES)}."]['samples'] == ['STATUS#2']
@@ -0,0 +1,35 @@
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import gene_panel_validation
+import sample_registry
+import validateData
+
+
+def test_edited_case_lists_and_panels_are_read_again(tmp_path):
+    case_list_path = tmp_path / 'case_lists' / 'cases_all.txt'
+    case_list_path.parent.mkdir()
+    case_list_path.write_text('stable_id: study_all\ncase_list_ids: S1\tS2\n')
+    assert sample_registry.read_case_list_ids(str(case_list_path)) == ['S1', 'S2']
+    case_list_path.write_text('stable_id: study_all\ncase_list_ids: S1\tS2\tS3\n')
+    assert sample_registry.read_case_list_ids(str(case_list_path)) == ['S1', 'S2', 'S3']
+
+    panel_path = tmp_path / 'gene_panels' / 'panel.txt'
+    panel_path.parent.mkdir()
+    panel_path.write_text('stable_id: PANEL\ngene_list: TP53\n')
+    assert list(gene_panel_validation.GenePanels.from_panel_files([str(panel_path)]).gene_index) == ['TP53']
+    panel_path.write_text('stable_id: PANEL\ngene_list: TP53\tKRAS\n')
+    assert list(gene_panel_validation.GenePanels.from_panel_files([str(panel_path)]).gene_index) == ['KRAS', 'TP53']
+
+def test_changed_panel_files_revalidate_the_panel_matrix(tmp_path):
+    study_dir = str(tmp_path)
+    meta = {os.path.join(study_dir, 'meta_gene_matrix.txt'): 'GENE_PANEL_MATRIX',
+            os.path.join(study_dir, 'meta_mutations.txt'): 'MUTATION'}
+    # A deleted panel file is a changed file as well
+    changed_files = {os.path.join(study_dir, 'gene_panels', 'deleted_panel.txt')}
+    assert validateData.get_file_dependent_meta_paths(study_dir, meta, changed_files) == {os.path.join(study_dir, 'meta_gene_matrix.txt')}
+    changed_files = {os.path.join(study_dir, 'case_lists', 'cases_all.txt')}
+    assert validateData.get_file_dependent_meta_paths(study_dir, meta, changed_files) == set()
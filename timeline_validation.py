@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Validation of clinical timeline files
+"""A timeline file has a row per clinical event of a patient, with the START_DATE and STOP_DATE of
+the event in days since diagnosis. Timeline files can hold tens of millions of events, so they are
+read in chunks and the checks of a chunk are whole-column operations.
+
+The events of a patient should be listed in chronological order. Per chunk, the events are sorted
+on patient once (a stable sort keeps the file order within a patient) and the start dates are
+compared with the previous event of the same patient; the last start date per patient is carried
+over to the next chunk."""
+
+import numpy as np
+import pandas as pd
+import data_reader
+from error_sink import RowCheckCounter, file_record
+
+REQUIRED_COLUMNS = ['PATIENT_ID', 'START_DATE', 'STOP_DATE', 'EVENT_TYPE']
+DEFAULT_CHUNKSIZE = 1000000
+
+# Only REQUIRED_COLUMNS are required by the cBioPortal timeline format. The event types it has tracks for are
+# listed here (EVENT_TYPE in upper case); other event types still load but are shown as custom tracks
+EVENT_TYPES = ['TREATMENT', 'LAB_TEST', 'IMAGING', 'STATUS', 'SPECIMEN', 'SURGERY', 'DIAGNOSTIC', 'DIAGNOSIS', 'SEQUENCING']
+
+# Columns that the track of an event type shows, a missing value gives an empty track entry
+EVENT_TYPE_COLUMNS = {
+    'TREATMENT': ['TREATMENT_TYPE'],
+    'LAB_TEST': ['TEST', 'RESULT'],
+    'IMAGING': ['DIAGNOSTIC_TYPE'],
+    'STATUS': ['STATUS'],
+    'SPECIMEN': ['SAMPLE_ID'],
+}
+
+
+def find_unordered_events(patient_ids, start_dates, last_start_dates):
+    """Returns a mask of the events that start before the previous event of the same patient, and the
+    last start date per patient. last_start_dates has the last start date per patient of the previous chunks."""
+    if len(patient_ids) == 0:
+        return np.zeros(0, dtype=bool), last_start_dates
+    patient_codes, patients = pd.factorize(patient_ids)
+    order = np.argsort(patient_codes, kind='stable')
+    sorted_patients, sorted_starts = patient_codes[order], start_dates[order]
+
+    group_start = np.ones(len(order), dtype=bool)
+    group_start[1:] = sorted_patients[1:] != sorted_patients[:-1]
+    previous_start = np.empty(len(order))
+    previous_start[1:] = sorted_starts[:-1]
+    # The first event of a patient in the chunk is compared with the last event of the previous chunks
+    previous_start[group_start] = last_start_dates.reindex(patients[sorted_patients[group_start]]).to_numpy(dtype='float64')
+
+    unordered = np.zeros(len(order), dtype=bool)
+    unordered[order] = sorted_starts < previous_start
+    group_end = np.append(group_start[1:], True)
+    last_starts = pd.Series(sorted_starts[group_end], index=patients[sorted_patients[group_end]])
+    return unordered, last_starts.combine_first(last_start_dates)
+
+def check_chunk(checks, chunk, offset, patient_index=None):
+    """Adds the failures of the checks of a chunk of events, except the ordering check."""
+    patient_ids = chunk['PATIENT_ID'].str.strip()
+    event_types = chunk['EVENT_TYPE'].str.strip().str.upper()
+    start_dates = pd.to_numeric(chunk['START_DATE'], errors='coerce').to_numpy(dtype='float64')
+    stop_dates = pd.to_numeric(chunk['STOP_DATE'], errors='coerce').to_numpy(dtype='float64')
+    has_stop = chunk['STOP_DATE'].notna().to_numpy()
+
+    checks.add_mask('PATIENT_ID', "ERROR - Missing patient ID.", patient_ids.isna().to_numpy(), offset=offset)
+    if patient_index is not None:
+        checks.add_mask('PATIENT_ID', "ERROR - Patient ID not defined in clinical file.",
+                        patient_ids.notna().to_numpy() & ~patient_ids.isin(patient_index).to_numpy(), patient_ids, offset)
+    checks.add_mask('EVENT_TYPE', "ERROR - Missing event type.", event_types.isna().to_numpy(), offset=offset)
+    checks.add_mask('EVENT_TYPE', f"WARNING - Unknown event type, expected one of {', '.join(EVENT_TYPES)}.",
+                    event_types.notna().to_numpy() & ~event_types.isin(EVENT_TYPES).to_numpy(), chunk['EVENT_TYPE'], offset)
+    # np.mod is NaN for missing values, so these fail as well
+    checks.add_mask('START_DATE', "ERROR - START_DATE is missing or not an integer.",
+                    np.mod(start_dates, 1) != 0, chunk['START_DATE'], offset)
+    checks.add_mask('STOP_DATE', "ERROR - STOP_DATE is not an integer.",
+                    has_stop & (np.mod(stop_dates, 1) != 0), chunk['STOP_DATE'], offset)
+    checks.add_mask('STOP_DATE', "ERROR - START_DATE should be smaller than or equal to STOP_DATE.",
+                    start_dates > stop_dates, stop_dates, offset)
+
+    for event_type, columns in EVENT_TYPE_COLUMNS.items():
+        of_type = (event_types == event_type).to_numpy()
+        if not of_type.any():
+            continue
+        for column in columns:
+            missing = chunk[column].isna().to_numpy() if column in chunk.columns else np.ones(len(chunk), dtype=bool)
+            checks.add_mask(column, f"WARNING - Missing {column}, expected for {event_type} events.", of_type & missing, offset=offset)
+
+def validate_timeline_file(file_path, meta_dict=None, cache=None, chunksize=None, registry=None, **kwargs):
+    """Validates a timeline file in chunks of rows; patients are checked against the registry when given."""
+    chunksize = chunksize or DEFAULT_CHUNKSIZE
+
+    def validate():
+        comment_lines, header = data_reader.read_header(file_path)
+        missing_columns = [column for column in REQUIRED_COLUMNS if column not in header]
+        if missing_columns:
+            return [file_record(f"ERROR - Missing required column(s) in timeline file: {', '.join(missing_columns)}.", data_file=file_path)]
+
+        checks = RowCheckCounter(data_file=file_path)
+        patient_index = pd.Index(list(registry.patient_ids)) if registry is not None else None
+        last_start_dates = pd.Series(dtype='float64')
+        offset = 0
+        # Only the comment lines before the header are skipped, a '#' in a value is part of the value
+        with pd.read_csv(file_path, sep='\t', skiprows=comment_lines, header=0, dtype=str, chunksize=chunksize) as reader:
+            for chunk in reader:
+                check_chunk(checks, chunk, offset, patient_index)
+                patient_ids = chunk['PATIENT_ID'].str.strip()
+                start_dates = pd.to_numeric(chunk['START_DATE'], errors='coerce').to_numpy(dtype='float64')
+                comparable = patient_ids.notna().to_numpy() & ~np.isnan(start_dates)
+                unordered = np.zeros(len(chunk), dtype=bool)
+                unordered[comparable], last_start_dates = find_unordered_events(
+                    patient_ids[comparable].to_numpy(), start_dates[comparable], last_start_dates)
+                checks.add_mask('START_DATE', "WARNING - Event starts before the previous event of the same patient.",
+                                unordered, patient_ids, offset)
+                offset += len(chunk)
+        return checks.records()
+
+    if cache is not None:
+        # The result also depends on the clinical file the registry was read from
+        depends_on = (registry.file_path,) if registry is not None else ()
+        return cache.cached('data', file_path, validate, depends_on=depends_on)
+    return validate()
@@ -1,4 +1,6 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
+import logging
 import pandas as pd
 import pandera as pa 
 from pandera import Check, Column, DataFrameSchema, Index, MultiIndex
@@ -8,23 +10,80 @@ from pandera_schemas import mut_schema
 from pydantic import BaseModel, ValidationError, validator, root_validator
 import pydantic_schemas
 from pydantic_schemas import MutData
+import validateMeta
+import mut_rules
+import data_reader
+import gene_table
+from error_sink import FailureCaseSink, DEFAULT_MAX_EXAMPLES, file_record, rewrite_report
+import seg_validation
+import clinical_validation
+import cna_validation
+import expression_validation
+import sv_validation
+import gene_panel_validation
+import timeline_validation
+import generic_assay_validation
+from functools import partial
 
-def parse_file_to_dataframe(file_path):
-    data = pd.read_csv(file_path, sep='\t', comment='#', header=0)
-    return data
+# Missing values (in lower case) of string columns, and missing values of numeric columns
+MISSING_STRINGS = ['unknown', 'n/a', 'na', 'null', '.', '', '?', '[not available]','[not applicable]', '[pending]', '[discrepancy]', '[completed]', '[null]']
+MISSING_NUMBERS = [0, 0.0] # Add any dataset-specific missing numbers
+# The reader recognizes the exact missing value tokens (data_reader.NULL_VALUES), the other spellings of the 
+# missing strings (e.g. 'Unknown', 'nA' or a padded ' NA ') are among the values of at most this length
+MISSING_STRING_LENGTH = max(len(value) for value in MISSING_STRINGS)
+# Columns of the mutation data where a missing value token is a valid value, e.g. the 'Unknown' Variant_Classification
+MUT_MISSING_VALUE_EXEMPT_COLUMNS = ['Variant_Classification']
+# Numeric columns of the mutation data with missing numbers, e.g. Entrez gene ID 0 for an intergenic variant;
+# in other columns (e.g. t_ref_count or Start_Position) 0 is a value
+MUT_MISSING_NUMBER_COLUMNS = ['Entrez_Gene_Id']
 
-def detect_and_replace_missing_values(df):
-    # Defining the list of missing values (in lower case) for each datatype
-    missing_strings = ['unknown', 'n/a', 'na', 'null', '.', '', '?', '[not available]','[not applicable]', '[pending]', '[discrepancy]', '[completed]', '[null]']
-    missing_numbers = [0, 0.0] # Add any dataset-specific missing numbers
+def parse_file_to_dataframe(file_path, dtype=None, columns=None):
+    """Reads a data file, with the given dtype per column. When columns are given, only those columns 
+    are read (see data_reader)."""
+    return data_reader.read_data_file(file_path, columns=columns, dtype=dtype)
 
-    for col in df.columns:
-        if df[col].dtype == object:  # if the column is of object type
-            df.loc[df[col].str.lower().isin(missing_strings), col] = pd.NA
-        elif df[col].dtype in [int, np.int64, float, np.float64]:  # if the column is of numeric type
-            df.loc[df[col].isin(missing_numbers), col] = pd.NA
+def normalize_mutation_rows(data_df):
+    """Returns mutation data as the row-level checks expect it (see mut_rules): stripped strings and None
+    for missing values, with one pass per column. Missing strings are matched in any case, only the short
+    values are lower-cased. Columns without missing values keep their dtype."""
+    columns = {}
+    for column, values in data_df.items():
+        inferred_type = pd.api.types.infer_dtype(values, skipna=True) if values.dtype == object else None
+        # The values are copied once, by the strip or when missing values are set to None
+        has_strings = inferred_type in ('string', 'mixed', 'mixed-integer')
+        if has_strings:
+            stripped = values.str.strip()
+            if inferred_type != 'string':
+                # Non-string values are kept as they are
+                stripped = stripped.fillna(values)
+            missing = stripped.isna().to_numpy()
+            if column not in MUT_MISSING_VALUE_EXEMPT_COLUMNS:
+                short = (stripped.str.len() <= MISSING_STRING_LENGTH).to_numpy()
+                missing[short] |= stripped[short].str.lower().isin(MISSING_STRINGS).to_numpy()
+            if column in MUT_MISSING_NUMBER_COLUMNS:
+                missing |= pd.to_numeric(stripped, errors='coerce').isin(MISSING_NUMBERS).to_numpy()
+            values = stripped
+        elif values.dtype.kind in 'iuf':
+            missing = values.isna().to_numpy()
+            if column in MUT_MISSING_NUMBER_COLUMNS:
+                missing |= values.isin(MISSING_NUMBERS).to_numpy()
+        else:
+            missing = values.isna().to_numpy()
+        if missing.any():
+            values = values.to_numpy(dtype=object, copy=not has_strings)
+            values[missing] = None
+        columns[column] = values
+    return pd.DataFrame(columns, index=data_df.index)
 
-    return df
+# Reports of the failure cases are written per study and data file under the full path of the study,
+# e.g. errors/data/studies/brca/data_mutations/ for /data/studies/brca, so the workers of a batch do not
+# overwrite each other's reports, also not for studies with the same directory name in different subtrees
+REPORT_ROOT = 'errors'
+
+def get_report_dir(study_dir, data_path):
+    drive, study_path = os.path.splitdrive(os.path.abspath(study_dir))
+    return os.path.join(REPORT_ROOT, drive.strip(':\\/'), study_path.lstrip(os.sep),
+                        os.path.splitext(os.path.basename(data_path))[0])
 
 # def preprocessing_data(study_dir, data_files):
 #     data = {}
@@ -33,23 +92,268 @@ def detect_and_replace_missing_values(df):
 #         data_df = detect_and_replace_missing_values(df)
     
 
-def pandera_validation(data_df) -> None:
-    # Validated data against schema
-    try: 
-        pandera_schemas.mut_schema.validate(data_df, lazy=True)
-    except pa.errors.SchemaErrors as err:
-        failure_cases = err.failure_cases
-        error_df = err.data
-
-    failure_cases_sorted = failure_cases.sort_values(by=['schema_context','column', 'index']).reset_index()
-    # failure_cases_grouped = failure_cases_sorted.groupby(['column','check','schema_context'])['failure_case','index'].agg(list).reset_index()
-    failure_cases_sorted.to_csv("errors/pandera/failure_cases.txt", sep = "\t")
-    error_df.to_csv("errors/pandera/errors.txt", sep = "\t")
-
-def pydantic_validation(data_df) -> None:
-    with open("errors/pydantic/errors.txt", "w") as file:
-        for idx, row in data_df.iterrows():
+# Rows per chunk of the Pandera validation, which bounds the number of failure cases held at once
+DEFAULT_CHUNKSIZE = 100000
+
+def rule_failure_cases(chunk, genes, sample_ids=None):
+    """Applies the MutData checks to a chunk of mutation data with the columnar rule engine (see mut_rules), after
+    normalizing its missing values. Returns the errors as failure cases: the field of an error is its column (none
+    for the checks on several columns), its message is the check and the failing value is the value in the file."""
+    row_errors = mut_rules.validate_mutation_rows(normalize_mutation_rows(chunk), genes=genes, sample_ids=sample_ids)
+    failing_values = pd.Series(None, index=row_errors.index, dtype=object)
+    for loc, positions in row_errors.groupby('loc').indices.items():
+        if loc in chunk.columns:
+            failing_values.iloc[positions] = chunk[loc].reindex(row_errors['row'].iloc[positions]).to_numpy()
+    return pd.DataFrame({'schema_context': 'MutData', 'column': row_errors['loc'].where(row_errors['loc'] != mut_rules.ROOT, None),
+                         'check': row_errors['msg'], 'failure_case': failing_values, 'index': row_errors['row']})
+
+# Worker state of the sharded row-level checks, set once per worker process by init_row_validation_worker
+_worker_genes = None
+_worker_sample_ids = None
+
+def init_row_validation_worker(snapshot_dir, sample_ids):
+    """Loads the gene table (memory-mapped, so the workers share its pages) and keeps the sample IDs, once per
+    worker process instead of sending them with every shard. Without a snapshot, the genes are not checked."""
+    global _worker_genes, _worker_sample_ids
+    _worker_genes = gene_table.load_gene_table(snapshot_dir) if snapshot_dir is not None else None
+    _worker_sample_ids = sample_ids
+
+def check_row_shard(shard):
+    return rule_failure_cases(shard, _worker_genes, _worker_sample_ids)
+
+class RowChecks:
+    """Row-level MutData checks of the chunks of a mutation file, with the columnar rule engine. With more than
+    one job, each chunk is split into a shard of consecutive rows per job, and the shards are checked in a pool
+    of worker processes while the Pandera checks of the chunk run in this process.
+    Without a gene reference snapshot, only the checks of the genes are skipped (see genes_error)."""
+
+    def __init__(self, sample_ids=None, jobs=None):
+        # No sample IDs means that Tumor_Sample_Barcode is not checked, e.g. when there is no registry
+        self.sample_ids = frozenset(sample_ids) if sample_ids is not None else None
+        self.jobs = jobs or 1
+        self.genes_error = None
+        try:
+            self.genes = gene_table.get_gene_table()
+        except FileNotFoundError as e:
+            self.genes = None
+            self.genes_error = str(e).strip()
+        self.executor = None
+
+    def __enter__(self):
+        if self.jobs > 1:
+            snapshot_dir = self.genes.snapshot_dir if self.genes is not None else None
+            self.executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=init_row_validation_worker,
+                                                initargs=(snapshot_dir, self.sample_ids))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    def start(self, chunk):
+        """Starts the checks of a chunk. Returns a function that returns their failure cases, in row order."""
+        if self.executor is None:
+            return partial(rule_failure_cases, chunk, self.genes, self.sample_ids)
+        shard_size = -(-len(chunk) // self.jobs)
+        futures = [self.executor.submit(check_row_shard, chunk.iloc[start:start + shard_size])
+                   for start in range(0, len(chunk), shard_size)]
+        return lambda: pd.concat([future.result() for future in futures], ignore_index=True)
+
+def pandera_validate_chunks(chunks, sink, first_row_line=None, row_checks=None):
+    """Validates chunks of mutation data, whose row index continues over the chunks. The table-wide checks
+    run once on the header of the first chunk and the column checks per chunk; the failure cases are added
+    to the sink per chunk (with their line number in the file, when the line of the first row is given).
+    With row_checks (RowChecks), the row-level checks of each chunk run as well."""
+    def add_failure_cases(failure_cases):
+        if first_row_line is not None:
+            failure_cases['line'] = pd.to_numeric(failure_cases['index'], errors='coerce') + first_row_line
+        sink.add(failure_cases)
+
+    header_checked = False
+    for chunk in chunks:
+        row_failure_cases = row_checks.start(chunk) if row_checks is not None and len(chunk) > 0 else None
+        if not header_checked:
             try:
-                pydantic_schemas.MutData(**row.to_dict())
-            except ValidationError as e:
-                file.write(f'Error in row {idx}: {e}\n\n')
\ No newline at end of file
+                pandera_schemas.mut_header_schema.validate(chunk.iloc[0:0], lazy=True)
+            except pa.errors.SchemaErrors as err:
+                add_failure_cases(err.failure_cases)
+            header_checked = True
+        try:
+            pandera_schemas.mut_chunk_schema.validate(chunk, lazy=True)
+        except pa.errors.SchemaErrors as err:
+            add_failure_cases(err.failure_cases)
+        if row_failure_cases is not None:
+            failure_cases = row_failure_cases()
+            if len(failure_cases) > 0:
+                add_failure_cases(failure_cases)
+
+def pandera_validation(data_df, max_examples=DEFAULT_MAX_EXAMPLES, data_file=None, report_dir=REPORT_ROOT, chunksize=DEFAULT_CHUNKSIZE,
+                       row_checks=None):
+    """Validates mutation data that is read already, in slices of rows so that the failure cases of only
+    one slice are held at once. Returns the closed sink, with the report and the failure cases kept."""
+    # The failing data itself (err.data) is not written, it would be a second copy of the input
+    with FailureCaseSink(os.path.join(report_dir, 'failure_cases.txt'), max_examples=max_examples, data_file=data_file) as sink:
+        # An empty file still has its header checked
+        pandera_validate_chunks((data_df.iloc[start:start + chunksize] for start in range(0, max(len(data_df), 1), chunksize)), sink,
+                                row_checks=row_checks)
+    return sink
+
+# Function to get the dtypes to read the columns of a schema with. Without them, pandas infers the 
+# dtype per chunk, e.g. an all-numeric chunk of the Chromosome column would be read as integers.
+# Integer columns are left to the coercion of the schema, as they may contain missing values.
+def get_read_dtypes(schema):
+    read_dtypes = {}
+    for column_name, column in schema.columns.items():
+        if str(column.dtype) == 'object':
+            read_dtypes[column_name] = str
+        elif str(column.dtype) == 'float64':
+            read_dtypes[column_name] = 'float64'
+    return read_dtypes
+
+# Columns of a mutation file that are validated, the other columns are not read
+MUT_COLUMNS = set(data_reader.referenced_columns(pandera_schemas.mut_schema, MutData, 
+                                                 extra_columns=pandera_schemas.CROSS_CHECK_COLUMNS))
+
+def drop_skipped_lines(chunks, sink, first_column, first_row_line):
+    """Reports and drops the blank lines and the comment lines in the body of a mutation file, which are
+    read as rows so that the row index gives the line number in the file."""
+    for chunk in chunks:
+        blank = chunk.isna().all(axis=1).to_numpy()
+        comment = chunk[first_column].str.startswith('#', na=False).to_numpy()
+        for message, mask in [("ERROR - Blank line.", blank),
+                              ("ERROR - Comment line after the header, comments should be at the top of the file.", comment)]:
+            if mask.any():
+                sink.add(pd.DataFrame({'schema_context': 'DataFrameSchema', 'column': None, 'check': message,
+                                       'failure_case': chunk[first_column][mask], 'index': chunk.index[mask],
+                                       'line': chunk.index[mask] + first_row_line}))
+        chunk = chunk[~(blank | comment)]
+        yield chunk if first_column in MUT_COLUMNS else chunk.drop(columns=first_column)
+
+def pandera_validation_chunked(file_path, chunksize=DEFAULT_CHUNKSIZE, max_examples=DEFAULT_MAX_EXAMPLES, report_dir=REPORT_ROOT,
+                               row_checks=None):
+    """Validates a mutation file in chunks of rows, so memory use does not grow with the file size. 
+    Failure cases keep the row index of the whole file and get the line number in the file. 
+    Returns the closed sink, with the report and the failure cases kept."""
+    comment_lines, header = data_reader.read_header(file_path)
+    # Rows start on the line after the comment lines and the header (line numbers start at 1). Only the comment lines
+    # before the header are skipped, so that the row index plus first_row_line is the line of the row in the file
+    first_row_line = comment_lines + 2
+    first_column = header[0]
+
+    read_dtypes = {**get_read_dtypes(pandera_schemas.mut_schema), first_column: str}
+    with FailureCaseSink(os.path.join(report_dir, 'failure_cases.txt'), max_examples=max_examples, extra_columns=['line'],
+                         data_file=file_path) as sink, \
+            pd.read_csv(file_path, sep='\t', skiprows=comment_lines, header=0, skip_blank_lines=False, dtype=read_dtypes,
+                        keep_default_na=False, na_values=data_reader.NULL_VALUES, chunksize=chunksize, usecols=lambda column: column in MUT_COLUMNS or column == first_column) as reader:
+        # The chunks continue the row index of the previous chunk, so failure cases refer to rows in the whole file
+        pandera_validate_chunks(drop_skipped_lines(reader, sink, first_column, first_row_line), sink, first_row_line=first_row_line,
+                                row_checks=row_checks)
+    return sink
+
+def validate_mutation_file(file_path, meta_dict=None, cache=None, chunksize=None, max_examples=DEFAULT_MAX_EXAMPLES,
+                           report_dir=REPORT_ROOT, jobs=None, **kwargs):
+    """Runs the Pandera validation and the row-level MutData checks of a mutation file, reading it in chunks of rows
+    when a chunk size is given. At most max_examples failure cases are kept per check, they are written to report_dir.
+    The row-level checks run in jobs worker processes when jobs is more than one.
+    Returns one report record per failed check. When a result cache is given, the records of an unchanged file are 
+    returned without validating it again."""
+    def validate():
+        # The samples (Tumor_Sample_Barcode) are checked against the registry by sample_registry.check_study_samples
+        with RowChecks(jobs=jobs) as row_checks:
+            if chunksize:
+                sink = pandera_validation_chunked(file_path, chunksize=chunksize, max_examples=max_examples, report_dir=report_dir,
+                                                  row_checks=row_checks)
+            else:
+                data_df = parse_file_to_dataframe(file_path, dtype=get_read_dtypes(pandera_schemas.mut_schema), columns=MUT_COLUMNS)
+                sink = pandera_validation(data_df, max_examples=max_examples, data_file=file_path, report_dir=report_dir,
+                                          row_checks=row_checks)
+        records = sink.report()
+        if row_checks.genes_error is not None:
+            records.append(file_record(f"WARNING - The genes of the mutations are not checked: {row_checks.genes_error}",
+                                       data_file=file_path))
+        return {'records': records, 'failure_cases': sink.examples}
+
+    if cache is None:
+        return validate()['records']
+    # The chunked validation reports line numbers (and blank lines), so its result differs from the in-memory one
+    result = cache.cached('data', file_path, validate, options=(max_examples, 'chunked' if chunksize else 'in-memory'))
+    # The failure cases are stored with the result, so the report files of a cached result are written again
+    rewrite_report(os.path.join(report_dir, 'failure_cases.txt'), result['records'], result['failure_cases'],
+                   extra_columns=['line'] if chunksize else [])
+    return result['records']
+
+# Data file validators per meta file type. Each is called with the data file path and the parsed meta file,
+# and the cache, chunksize, max_examples, registry (sample_registry.SampleRegistry), study_meta, report_dir and jobs options,
+# which a validator may ignore
+DATA_VALIDATORS = {
+    'MUTATION': validate_mutation_file,
+    'SEG': seg_validation.validate_seg_file,
+    'SAMPLE_ATTRIBUTES': clinical_validation.validate_sample_file,
+    'PATIENT_ATTRIBUTES': clinical_validation.validate_patient_file,
+    'CNA_DISCRETE': partial(cna_validation.validate_cna_file, meta_file_type='CNA_DISCRETE'),
+    'CNA_CONTINUOUS': partial(cna_validation.validate_cna_file, meta_file_type='CNA_CONTINUOUS'),
+    'CNA_LOG2': partial(cna_validation.validate_cna_file, meta_file_type='CNA_LOG2'),
+    'EXPRESSION': expression_validation.validate_expression_file,
+    'METHYLATION': expression_validation.validate_expression_file,
+    'STRUCTURAL_VARIANT': sv_validation.validate_sv_file,
+    'GENE_PANEL_MATRIX': gene_panel_validation.validate_gene_panel_file,
+    'TIMELINE': timeline_validation.validate_timeline_file,
+    'GENERIC_ASSAY_CONTINUOUS': partial(generic_assay_validation.validate_generic_assay_file, meta_file_type='GENERIC_ASSAY_CONTINUOUS'),
+    'GENERIC_ASSAY_BINARY': partial(generic_assay_validation.validate_generic_assay_file, meta_file_type='GENERIC_ASSAY_BINARY'),
+    'GENERIC_ASSAY_CATEGORICAL': partial(generic_assay_validation.validate_generic_assay_file, meta_file_type='GENERIC_ASSAY_CATEGORICAL'),
+}
+
+# Data files that are checked against the data file of another meta file type, 
+# e.g. the sample IDs of the mutation data should be defined in the clinical sample file
+CROSS_FILE_DEPENDENCIES = {
+    'SAMPLE_ATTRIBUTES': ['MUTATION', 'CNA_DISCRETE', 'CNA_CONTINUOUS', 'CNA_LOG2', 'EXPRESSION', 'METHYLATION', 'GENE_PANEL_MATRIX',
+                          'TIMELINE', 'GENERIC_ASSAY_CONTINUOUS', 'GENERIC_ASSAY_BINARY', 'GENERIC_ASSAY_CATEGORICAL'],
+    'MUTATION': ['GENE_PANEL_MATRIX'],
+}
+
+# Directories of the files besides the data files (e.g. the gene panel files) that the data files of a meta file type
+# are checked against, per meta file type, as a function of the study directory
+FILE_DEPENDENCIES = {
+    'GENE_PANEL_MATRIX': gene_panel_validation.get_panel_dirs,
+}
+
+def get_file_dependent_meta_paths(study_dir, meta, file_paths):
+    """Returns the meta paths of the data files that are checked against one of the files (e.g. an edited or
+    deleted gene panel file)."""
+    file_dirs = {os.path.dirname(os.path.normpath(file_path)) for file_path in file_paths}
+    return {meta_path for meta_path, meta_file_type in meta.items() if meta_file_type in FILE_DEPENDENCIES
+            and any(os.path.normpath(dependency_dir) in file_dirs for dependency_dir in FILE_DEPENDENCIES[meta_file_type](study_dir))}
+
+def get_dependent_meta_paths(meta, meta_paths):
+    """Returns the meta paths together with the meta paths of the data files that are checked against their data files."""
+    dependent_types = {dependent_type for meta_path in meta_paths for dependent_type in CROSS_FILE_DEPENDENCIES.get(meta[meta_path], [])}
+    return set(meta_paths) | {meta_path for meta_path, meta_file_type in meta.items() if meta_file_type in dependent_types}
+
+def validate_data(study_dir, meta, meta_paths=None, cache=None, chunksize=None, max_examples=None, registry=None, jobs=None):
+    """Validates the data files of the given meta files (all by default) that have a data
+    validator, and returns the data file path and result per meta file path. 
+    With a chunk size, data files are read and validated in chunks of that many rows.
+    With jobs, the rows of large data files are validated in that many worker processes.
+    At most max_examples (by default DEFAULT_MAX_EXAMPLES) failure cases are kept per check."""
+    if max_examples is None:
+        max_examples = DEFAULT_MAX_EXAMPLES
+    results = {}
+    for meta_path, meta_file_type in meta.items():
+        if meta_paths is not None and meta_path not in meta_paths:
+            continue
+        if meta_file_type not in DATA_VALIDATORS:
+            continue
+        meta_dict, _ = validateMeta.get_parsed_meta(meta_path)
+        data_path = os.path.join(study_dir, meta_dict['data_filename'])
+        logging.info(f'Starting validation of {data_path}')
+        data_validator = DATA_VALIDATORS[meta_file_type]
+        try:
+            result = data_validator(data_path, meta_dict=meta_dict, cache=cache, chunksize=chunksize, max_examples=max_examples,
+                                    registry=registry, study_meta=meta, report_dir=get_report_dir(study_dir, data_path), jobs=jobs)
+        except Exception as e:
+            # A file that cannot be validated (e.g. without a gene reference snapshot) is reported,
+            # the other data files are still validated
+            logging.error(f'Validation of {data_path} failed: {str(e).strip()}')
+            result = [file_record(f"ERROR - File could not be validated: {str(e).strip()}", data_file=data_path)]
+        results[meta_path] = (data_path, result)
+    return results
@@ -9,78 +9,124 @@ from cerberus import Validator
 from cerberus_schemas import META_SCHEMA_MAP
 import logging
 
-# Function to parse file to an ordered dictionary 
-def parse_file_to_ordered_dict(file_path):
+# Parsed meta files, keyed by path. Each entry holds the (mtime, size) signature of the 
+# file when it was parsed, so a file is only read again from disk when it has changed.
+_meta_cache = {}
+
+# Function to parse file to an ordered dictionary, keeping the line number of each key
+def parse_meta_file(file_path):
     meta_dict = OrderedDict()
+    line_numbers = {}
     with open(file_path, 'r') as metafile:
         for line_index, line in enumerate(metafile):
             line = line.strip()
             if not line:
                 continue
             if ':' not in line:
-                raise Exception(f"\nInvalid file entry, no ':' found")
+                raise Exception(f"\nInvalid file entry in {file_path}, line {line_index + 1}: no ':' found")
 
             key, value = map(str.strip, line.split(':', 1))
             meta_dict[key] = value
+            line_numbers[key] = line_index + 1
+    return meta_dict, line_numbers
+
+def parse_file_to_ordered_dict(file_path):
+    meta_dict, _ = get_parsed_meta(file_path)
     return meta_dict
 
-# Function to get the meta file type 
-def get_meta_file_type(meta_dict):
-    alt_type_datatype_to_meta = {
-        # cancer type
-        ("CANCER_TYPE", "CANCER_TYPE"): "CANCER_TYPE",
-        # clinical and timeline
-        ("CLINICAL", "PATIENT_ATTRIBUTES"): "PATIENT_ATTRIBUTES",
-        ("CLINICAL_SAMPLE", "SAMPLE_ATTRIBUTES"): "SAMPLE_ATTRIBUTES",
-        ("CLINICAL", "TIMELINE"): "TIMELINE",
-        # rppa and mass spectrometry
-        ("PROTEIN_LEVEL", "LOG2-VALUE"): "PROTEIN",
-        ("PROTEIN_LEVEL", "Z-SCORE"): "PROTEIN",
-        ("PROTEIN_LEVEL", "CONTINUOUS"): "PROTEIN",
-        # cna
-        ("COPY_NUMBER_ALTERATION", "DISCRETE"): "CNA_DISCRETE",
-        ("COPY_NUMBER_ALTERATION", "DISCRETE_LONG"): "CNA_DISCRETE_LONG",
-        ("COPY_NUMBER_ALTERATION", "CONTINUOUS"): "CNA_CONTINUOUS",
-        ("COPY_NUMBER_ALTERATION", "LOG2-VALUE"): "CNA_LOG2",
-        ("COPY_NUMBER_ALTERATION", "SEG"): "SEG",
-        # expression
-        ("MRNA_EXPRESSION", "CONTINUOUS"): "EXPRESSION",
-        ("MRNA_EXPRESSION", "Z-SCORE"): "EXPRESSION",
-        ("MRNA_EXPRESSION", "DISCRETE"): "EXPRESSION",
-        # mutations
-        ("MUTATION_EXTENDED", "MAF"): "MUTATION",
-        ("MUTATION_UNCALLED", "MAF"): "MUTATION_UNCALLED",
-        # others
-        ("METHYLATION", "CONTINUOUS"): "METHYLATION",
-        ("GENE_PANEL_MATRIX", "GENE_PANEL_MATRIX"): "GENE_PANEL_MATRIX",
-        ("STRUCTURAL_VARIANT", "SV"): "STRUCTURAL_VARIANT",
-        # cross-sample molecular statistics (for gene selection)
-        ("GISTIC_GENES_AMP", "Q-VALUE"): "GISTIC_GENES",
-        ("GISTIC_GENES_DEL", "Q-VALUE"): "GISTIC_GENES",
-        ("MUTSIG", "Q-VALUE"): "MUTATION_SIGNIFICANCE",
-        ("GENESET_SCORE", "GSVA-SCORE"): "GSVA_SCORES",
-        ("GENESET_SCORE", "P-VALUE"): "GSVA_PVALUES",
-        ("GENERIC_ASSAY", "LIMIT-VALUE"): "GENERIC_ASSAY_CONTINUOUS",
-        ("GENERIC_ASSAY", "BINARY"): "GENERIC_ASSAY_BINARY",
-        ("GENERIC_ASSAY", "CATEGORICAL"): "GENERIC_ASSAY_CATEGORICAL"
-    }
+# Function to get a parsed meta file from the cache
+def get_parsed_meta(file_path, stat_result=None):
+    """Returns the parsed meta file and the line numbers of its keys. The stat result of the file
+    (given, e.g. from os.scandir, or taken here) is compared to the cached signature, and the file
+    is parsed again if it changed, so a resident process (--watch) sees edited files."""
+    cached = _meta_cache.get(file_path)
+    if stat_result is None:
+        stat_result = os.stat(file_path)
+    signature = (stat_result.st_mtime_ns, stat_result.st_size)
+    if cached is not None and cached[0] == signature:
+        return cached[1], cached[2]
+
+    meta_dict, line_numbers = parse_meta_file(file_path)
+    _meta_cache[file_path] = (signature, meta_dict, line_numbers)
+    return meta_dict, line_numbers
 
-    fields_to_meta = {
-        # study
-        ("cancer_study_identifier", "type_of_cancer"): "STUDY",
-        # resource
-        ("cancer_study_identifier", "resource_type"): {
-            "PATIENT": "PATIENT_RESOURCES",
-            "SAMPLE": "SAMPLE_RESOURCES",
-            "STUDY": "STUDY_RESOURCES",
-            "DEFINITION": "RESOURCES_DEFINITION"
-        }
+# Meta file types by (genetic_alteration_type, datatype)
+ALT_TYPE_DATATYPE_TO_META = {
+    # cancer type
+    ("CANCER_TYPE", "CANCER_TYPE"): "CANCER_TYPE",
+    # clinical and timeline
+    ("CLINICAL", "PATIENT_ATTRIBUTES"): "PATIENT_ATTRIBUTES",
+    ("CLINICAL_SAMPLE", "SAMPLE_ATTRIBUTES"): "SAMPLE_ATTRIBUTES",
+    ("CLINICAL", "TIMELINE"): "TIMELINE",
+    # rppa and mass spectrometry
+    ("PROTEIN_LEVEL", "LOG2-VALUE"): "PROTEIN",
+    ("PROTEIN_LEVEL", "Z-SCORE"): "PROTEIN",
+    ("PROTEIN_LEVEL", "CONTINUOUS"): "PROTEIN",
+    # cna
+    ("COPY_NUMBER_ALTERATION", "DISCRETE"): "CNA_DISCRETE",
+    ("COPY_NUMBER_ALTERATION", "DISCRETE_LONG"): "CNA_DISCRETE_LONG",
+    ("COPY_NUMBER_ALTERATION", "CONTINUOUS"): "CNA_CONTINUOUS",
+    ("COPY_NUMBER_ALTERATION", "LOG2-VALUE"): "CNA_LOG2",
+    ("COPY_NUMBER_ALTERATION", "SEG"): "SEG",
+    # expression
+    ("MRNA_EXPRESSION", "CONTINUOUS"): "EXPRESSION",
+    ("MRNA_EXPRESSION", "Z-SCORE"): "EXPRESSION",
+    ("MRNA_EXPRESSION", "DISCRETE"): "EXPRESSION",
+    # mutations
+    ("MUTATION_EXTENDED", "MAF"): "MUTATION",
+    ("MUTATION_UNCALLED", "MAF"): "MUTATION_UNCALLED",
+    # others
+    ("METHYLATION", "CONTINUOUS"): "METHYLATION",
+    ("GENE_PANEL_MATRIX", "GENE_PANEL_MATRIX"): "GENE_PANEL_MATRIX",
+    ("STRUCTURAL_VARIANT", "SV"): "STRUCTURAL_VARIANT",
+    # cross-sample molecular statistics (for gene selection)
+    ("GISTIC_GENES_AMP", "Q-VALUE"): "GISTIC_GENES",
+    ("GISTIC_GENES_DEL", "Q-VALUE"): "GISTIC_GENES",
+    ("MUTSIG", "Q-VALUE"): "MUTATION_SIGNIFICANCE",
+    ("GENESET_SCORE", "GSVA-SCORE"): "GSVA_SCORES",
+    ("GENESET_SCORE", "P-VALUE"): "GSVA_PVALUES",
+    ("GENERIC_ASSAY", "LIMIT-VALUE"): "GENERIC_ASSAY_CONTINUOUS",
+    ("GENERIC_ASSAY", "BINARY"): "GENERIC_ASSAY_BINARY",
+    ("GENERIC_ASSAY", "CATEGORICAL"): "GENERIC_ASSAY_CATEGORICAL"
+}
+
+# Meta file types by the fields that identify them, for meta files without 
+# genetic_alteration_type and datatype (a nested dictionary maps the value of the last field)
+FIELDS_TO_META = {
+    # study
+    ("cancer_study_identifier", "type_of_cancer"): "STUDY",
+    # resource
+    ("cancer_study_identifier", "resource_type"): {
+        "PATIENT": "PATIENT_RESOURCES",
+        "SAMPLE": "SAMPLE_RESOURCES",
+        "STUDY": "STUDY_RESOURCES",
+        "DEFINITION": "RESOURCES_DEFINITION"
     }
+}
+
+# Precomputed index of FIELDS_TO_META on (distinguishing field, field value), the distinguishing field being the
+# last field of each field tuple; a value of None matches any value of the field
+FIELDS_TO_META_INDEX = {}
+for tuple_of_fields, fields_meta_type in FIELDS_TO_META.items():
+    if isinstance(fields_meta_type, dict):
+        FIELDS_TO_META_INDEX.update({(tuple_of_fields[-1], value): (tuple_of_fields, value_meta_type)
+                                     for value, value_meta_type in fields_meta_type.items()})
+    else:
+        FIELDS_TO_META_INDEX[(tuple_of_fields[-1], None)] = (tuple_of_fields, fields_meta_type)
+DISTINGUISHING_FIELDS = list(dict.fromkeys(field for field, _ in FIELDS_TO_META_INDEX))
+
+# Function to get the meta file type 
+def get_meta_file_type(meta_dict):
     genetic_alteration_type = meta_dict.get('genetic_alteration_type', None)
     data_type = meta_dict.get('datatype', None)
 
-    meta_file_type = alt_type_datatype_to_meta.get((genetic_alteration_type, data_type),
-                    next((fields_to_meta[tuple_of_fields] for tuple_of_fields in fields_to_meta.keys() if set(tuple_of_fields).issubset(meta_dict.keys())), None))
+    meta_file_type = ALT_TYPE_DATATYPE_TO_META.get((genetic_alteration_type, data_type))
+    if meta_file_type is None:
+        field = next((field for field in DISTINGUISHING_FIELDS if field in meta_dict), None)
+        tuple_of_fields, fields_meta_type = FIELDS_TO_META_INDEX.get(
+            (field, meta_dict.get(field)), FIELDS_TO_META_INDEX.get((field, None), ((), None)))
+        if all(key in meta_dict for key in tuple_of_fields):
+            meta_file_type = fields_meta_type
 
     if meta_file_type is None:
         raise Exception("Could not determine the file type. Please check your meta files for correct configuration.")
@@ -89,23 +135,56 @@ def get_meta_file_type(meta_dict):
 
 # Function to parse all the meta files 
 def parse_metadata(study_dir, meta_files):
-    meta = {} # Dictionary to store the parsed meta files based on their type
+    meta = {} # Dictionary to store the type of each parsed meta file, a study can have several meta files of a type
     for meta_file in meta_files:
         meta_path = os.path.join(study_dir, meta_file)
-        meta_dict = parse_file_to_ordered_dict(meta_path)
-        meta_file_type = get_meta_file_type(meta_dict)
-        meta[meta_file_type] = meta_path
+        meta_dict, _ = get_parsed_meta(meta_path)
+        meta[meta_path] = get_meta_file_type(meta_dict)
     return meta 
 
-def validate_metadata(meta) -> None:
-    for meta_file_type, meta_path in meta.items():
+def get_meta_paths(meta, meta_file_type):
+    """Returns the paths of the meta files of a type, in the order of the meta files."""
+    return [meta_path for meta_path, file_type in meta.items() if file_type == meta_file_type]
+
+# Validators per meta file type, created at first use. Passing the schema to the Validator 
+# once means Cerberus only normalizes and checks each schema once per process.
+_validators = {}
+
+def get_validator(meta_file_type):
+    v = _validators.get(meta_file_type)
+    if v is None:
+        v = _validators[meta_file_type] = Validator(META_SCHEMA_MAP.get(meta_file_type))
+    return v
+
+# Function to validate a single meta file against the schema of its type
+def validate_meta_file(meta_file_type, meta_dict):
+    v = get_validator(meta_file_type)
+    if v.validate(meta_dict) != True:
+        return v.errors
+    return {}
+
+def validate_metadata(meta, cache=None):
+    """Validates the parsed meta files and returns the Cerberus errors per meta file path 
+    (empty when all meta files are valid). When a result cache is given, meta files that 
+    did not change since a previous run are not validated again."""
+    meta_errors = {}
+    for meta_path, meta_file_type in meta.items():
         logging.info(f'Starting validation of {meta_file_type}')
-        meta_dict = parse_file_to_ordered_dict(meta_path)
-        v = Validator()
-        if v.validate(meta_dict, META_SCHEMA_MAP.get(meta_file_type)) != True:
+        meta_dict, line_numbers = get_parsed_meta(meta_path)
+        if cache is not None:
+            errors = cache.cached('meta', meta_path, lambda: validate_meta_file(meta_file_type, meta_dict))
+        else:
+            errors = validate_meta_file(meta_file_type, meta_dict)
+        if errors:
+            meta_errors[meta_path] = errors
             print("ERRORS:")
-            print(v.errors)
+            for field, field_errors in errors.items():
+                # Missing required fields have no line to point to
+                if field in line_numbers:
+                    print(f"{meta_path}, line {line_numbers[field]}: {field}: {field_errors}")
+                else:
+                    print(f"{meta_path}: {field}: {field_errors}")
             print()
         else:
             logging.info(f'Validation of {meta_file_type} complete without errors.\n')    
-
+    return meta_errors
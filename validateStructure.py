@@ -4,13 +4,12 @@
 import os
 import regex as re
 import logging
+import validateMeta
 
 def get_data_filename(meta_file_path):
-    with open(meta_file_path, 'r') as file:
-        for line in file:
-            if line.startswith('data_filename'):
-                return line.split(': ')[1].strip()  # return the value after ': '
-    return None  # return None if 'data_filename' is not found
+    # Meta files are parsed once and shared with the meta validation through the cache
+    meta_dict, _ = validateMeta.get_parsed_meta(meta_file_path)
+    return meta_dict.get('data_filename')  # return None if 'data_filename' is not found
 
 
 def validate_directory(directory):
@@ -27,12 +26,18 @@ def validate_directory(directory):
     case_list_files = []
     meta_study_file = None
     meta_clinical_sample_file = None
-    for file in sorted(os.listdir(directory)):
+    # A single scandir pass lists the directory and fills the meta file cache, 
+    # using the stat results of the directory entries to detect changed files
+    with os.scandir(directory) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+    for entry in entries:
+        file = entry.name
         # Checks for meta file naming conventions
         # Check if file name contains the word "meta" as a whole word or as a part of another word, 
         # with an optional underscore or numeric character at the end.
         if re.search(r'(\b|_)meta(\b|[_0-9])', file, flags=re.IGNORECASE) and not file.startswith('ONCOKB_IMPORT_BACKUP') and not file.startswith('.') and not file.endswith('~'):
             meta_files.append(file)
+            validateMeta.get_parsed_meta(entry.path, entry.stat())
             if "study" in file:
                 meta_study_file = file
             if "clinical_sample" in file:
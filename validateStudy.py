@@ -1,40 +1,285 @@
 import os
 import os.path as osp
 import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 import validateStructure
 import validateMeta
 #import validateData
-import pandas as pd
+from result_cache import ResultCache, DEFAULT_MAX_SIZE
 import logging
 
-def validate_study(input_dir: str) -> None:
+# validateData (and with it pandas, pandera and pydantic) is only imported when the data stage runs,
+# so a structure and meta validation starts with cerberus only
+STAGES = ['structure', 'meta', 'data']
+DEFAULT_STAGES = ['structure', 'meta']
+
+def validate_study(input_dir: str, cache=None, stages=DEFAULT_STAGES, chunksize=None, max_examples=None, jobs=None):
     # First level of validation - validate the directory structure
+    # The directory is always read, the later stages need its list of meta files
     meta_files, data_files = validateStructure.validate_directory(input_dir)
+    errors = {}
+    if 'meta' not in stages and 'data' not in stages:
+        return errors
 
-    # Second level of validation - validate the meta files 
+    # Second level of validation - validate the meta files
     meta = validateMeta.parse_metadata(input_dir, meta_files)
-    print(validateMeta.validate_metadata(meta))
-    
+    if 'meta' in stages:
+        errors.update(validateMeta.validate_metadata(meta, cache=cache))
+
     # Third level of validation - validate the data files
-    #data_df = pd.read_csv("sample_data/brca_jup_msk_2020/data_mutations.txt", sep='\t', comment='#', header=0)
-    #validateData.pandera_validation(data_df)
-    #validateData.pydantic_validation(data_df)
+    if 'data' in stages:
+        import validateData
+        import sample_registry
+        # The sample IDs of all files are checked against one registry of the clinical samples
+        registry = sample_registry.get_sample_registry(input_dir, meta)
+        data_results = validateData.validate_data(input_dir, meta, cache=cache, chunksize=chunksize, max_examples=max_examples,
+                                                  registry=registry, jobs=jobs)
+        for data_path, data_errors in data_results.values():
+            if data_errors:
+                errors[data_path] = data_errors
+
+        for file_path, samples in sample_registry.check_study_samples(input_dir, meta, registry).items():
+            logging.info(f"{file_path}: {len(samples['unknown'])} unknown, {len(samples['missing'])} missing "
+                         f"and {len(samples['orphaned'])} orphaned sample(s).")
+            if samples['unknown'] or samples['orphaned']:
+                errors.setdefault('samples', {})[file_path] = samples
+
+    return errors
+
+def has_errors(file_errors):
+    """Returns whether the errors of a file include an error. The report records of a data file
+    (see error_sink) include warnings and info as well, only records with severity ERROR count."""
+    if isinstance(file_errors, list) and all(isinstance(record, dict) and 'severity' in record for record in file_errors):
+        return any(record['severity'] == 'ERROR' for record in file_errors)
+    return bool(file_errors)
+
+def find_study_dirs(root_dir):
+    """Returns all study directories (directories containing a meta_study file) under the root directory."""
+    study_dirs = []
+    for dir_path, dir_names, file_names in os.walk(root_dir):
+        # Hidden directories (e.g. .git in a datahub checkout) never contain studies
+        dir_names[:] = sorted(dir_name for dir_name in dir_names if not dir_name.startswith('.'))
+        if any(file_name.startswith('meta_study') for file_name in file_names):
+            study_dirs.append(dir_path)
+            # Subdirectories of a study (e.g. case_lists) are not studies themselves
+            dir_names[:] = []
+    return study_dirs
+
+def validate_study_summary(input_dir: str, cache=None, stages=DEFAULT_STAGES, chunksize=None, max_examples=None, jobs=None):
+    """Validates one study and summarizes the outcome, so that a failing study does not
+    abort the validation of the other studies in a batch."""
+    try:
+        errors = validate_study(input_dir, cache=cache, stages=stages, chunksize=chunksize, max_examples=max_examples, jobs=jobs)
+    except Exception as e:
+        return {'study': input_dir, 'status': 'ERROR', 'errors': str(e).strip()}
+    status = 'FAILED' if any(has_errors(file_errors) for file_errors in errors.values()) else 'PASSED'
+    return {'study': input_dir, 'status': status, 'errors': errors}
+
+def validate_studies(root_dir: str, jobs=None, cache=None, stages=DEFAULT_STAGES, chunksize=None, max_examples=None):
+    """Validates all studies under the root directory, spread over a pool of worker processes."""
+    study_dirs = find_study_dirs(root_dir)
+    if len(study_dirs) == 0:
+        raise Exception(f"No study directories found in {root_dir}.")
+    logging.info(f"Validating {len(study_dirs)} studies with {jobs or os.cpu_count()} worker processes.")
+
+    summaries = []
+    retry_dirs = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(validate_study_summary, study_dir, cache, stages, chunksize, max_examples): study_dir
+                   for study_dir in study_dirs}
+        for future in as_completed(futures):
+            try:
+                summaries.append(future.result())
+            except BrokenProcessPool:
+                retry_dirs.append(futures[future])
+            except Exception as e:
+                summaries.append({'study': futures[future], 'status': 'ERROR', 'errors': str(e).strip()})
+    # A worker that dies (e.g. killed for running out of memory) breaks the pool, which fails the studies that were
+    # still pending as well. These are validated again one at a time, so only a study whose worker dies again fails
+    for study_dir in sorted(retry_dirs):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            try:
+                summaries.append(executor.submit(validate_study_summary, study_dir, cache, stages, chunksize, max_examples).result())
+            except Exception as e:
+                summaries.append({'study': study_dir, 'status': 'ERROR', 'errors': f'Worker failed: {type(e).__name__}: {str(e).strip()}'})
+    summaries.sort(key=lambda summary: summary['study'])
+    print_summaries(summaries)
+    return summaries
+
+def print_summaries(summaries):
+    print("SUMMARY:")
+    for summary in summaries:
+        print(f"{summary['status']}\t{summary['study']}\t{summary['errors'] or ''}")
+
+def file_signatures(input_dir):
+    """Returns the (mtime, size) signature of every file in the study directory and its subdirectories."""
+    signatures = {}
+    dirs = [input_dir]
+    while dirs:
+        with os.scandir(dirs.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    dirs.append(entry.path)
+                else:
+                    stat_result = entry.stat()
+                    signatures[entry.path] = (stat_result.st_mtime_ns, stat_result.st_size)
+    return signatures
+
+def print_report(report, changed_files, elapsed):
+    print(f"REPORT ({len(changed_files)} changed file(s) revalidated in {elapsed:.2f}s):")
+    for file_path, errors in sorted(report.items()):
+        if has_errors(errors):
+            print(f"FAILED\t{file_path}\t{len(errors)} error(s)")
+        elif errors:
+            print(f"PASSED\t{file_path}\t{len(errors)} warning(s)")
+        else:
+            print(f"PASSED\t{file_path}")
+    print()
+
+def watch_study(input_dir: str, interval=0.5, cache=None, chunksize=None, max_examples=None, jobs=None):
+    """Keeps validating the study while its files are edited. The directory is polled for changed files;
+    the schemas, gene table and parsed meta files stay loaded in this process, and only the changed files
+    (and the data files that are checked against them) are validated again."""
+    # The data validation modules are only needed (and loaded once) for the resident process
+    import validateData
+    import sample_registry
+
+    report = {} # Errors per validated file
+    meta = {}
+    registry = None
+    signatures = {}
+    while True:
+        new_signatures = file_signatures(input_dir)
+        changed_files = {file_path for file_path in signatures.keys() | new_signatures.keys()
+                         if signatures.get(file_path) != new_signatures.get(file_path)}
+        if changed_files:
+            start = time.perf_counter()
+            report.pop(input_dir, None)
+            for file_path in changed_files - new_signatures.keys():
+                report.pop(file_path, None)
+                report.pop(f'{file_path} (sample IDs)', None)
+            try:
+                # The structure checks are cheap and depend on all files, so they always run again
+                meta_files, data_files = validateStructure.validate_directory(input_dir)
+                previous_meta, meta = meta, validateMeta.parse_metadata(input_dir, meta_files)
+
+                # Revalidate the meta files that changed or were not validated before
+                changed_meta_paths = [meta_path for meta_path, meta_file_type in meta.items()
+                                      if meta_path in changed_files or previous_meta.get(meta_path) != meta_file_type]
+                meta_errors = validateMeta.validate_metadata({meta_path: meta[meta_path] for meta_path in changed_meta_paths}, cache=cache)
+                for meta_path in changed_meta_paths:
+                    report[meta_path] = meta_errors.get(meta_path, {})
+
+                # Revalidate the data files that changed, whose meta file changed, or that depend on a changed file
+                changed_data_paths = set(changed_meta_paths)
+                for meta_path in meta:
+                    meta_dict, _ = validateMeta.get_parsed_meta(meta_path)
+                    if os.path.join(input_dir, meta_dict.get('data_filename', '')) in changed_files:
+                        changed_data_paths.add(meta_path)
+                # and the data files that are checked against a changed file besides the data files (e.g. a gene panel file);
+                # changed case lists are checked against the registry below
+                changed_data_paths.update(validateData.get_file_dependent_meta_paths(input_dir, meta, changed_files))
+
+                # The registry is read again when the clinical sample file or its meta file changed,
+                # the data files of the dependent meta types are then checked against the new registry
+                sample_meta_paths = validateMeta.get_meta_paths(meta, 'SAMPLE_ATTRIBUTES')
+                registry_changed = (registry is None or registry.file_path in changed_files
+                                    or any(meta_path in changed_meta_paths for meta_path in sample_meta_paths[:1]))
+                if registry_changed:
+                    registry = sample_registry.get_sample_registry(input_dir, meta)
+                    changed_data_paths.update(sample_meta_paths[:1])
+
+                data_results = validateData.validate_data(input_dir, meta, validateData.get_dependent_meta_paths(meta, changed_data_paths),
+                                                          cache=cache, chunksize=chunksize, max_examples=max_examples, registry=registry,
+                                                          jobs=jobs)
+                for data_path, errors in data_results.values():
+                    report[data_path] = errors
+
+                # All sample IDs are checked again against a new registry, otherwise only those of the changed files
+                sample_results = sample_registry.check_study_samples(input_dir, meta, registry,
+                                                                     file_paths=None if registry_changed else changed_files)
+                for file_path, samples in sample_results.items():
+                    report[f'{file_path} (sample IDs)'] = {kind: samples[kind] for kind in ['unknown', 'orphaned'] if samples[kind]}
+            except Exception as e:
+                # Keep watching, the report shows the problem until the files are fixed
+                report[input_dir] = [str(e).strip()]
+                meta = {}
+                registry = None
+            print_report(report, changed_files, time.perf_counter() - start)
+            signatures = new_signatures
+        time.sleep(interval)
 
-    
 
 if __name__ == '__main__':
     # Usage example: python3 validateStudy.py -i data/
+    #                python3 validateStudy.py -i data/ --watch
+    #                python3 validateStudy.py -r datahub/public/ -j 8
+    #                python3 validateStudy.py -i data/ -s structure,meta,data
 
     parser = argparse.ArgumentParser(description="Transforms all files for all studies in input folder to cBioPortal "
                                                  "staging files")
-    
-    parser.add_argument("-i", "--input_dir",
-                        required=True,
-                        help="Directory containing input files.")
+
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument("-i", "--input_dir",
+                             help="Directory containing input files.")
+    input_group.add_argument("-r", "--root_dir",
+                             help="Directory containing multiple study directories, which are validated in batch.")
+    parser.add_argument("-j", "--jobs",
+                        type=int,
+                        default=None,
+                        help="Number of worker processes. A batch (-r) validates that many studies at once (default: number "
+                             "of CPUs), a single study (-i) validates the rows of its large data files in that many processes (default: 1).")
+    parser.add_argument("-c", "--cache_dir",
+                        default=None,
+                        help="Directory of the validation result cache. Unchanged files are not validated again.")
+    parser.add_argument("--cache_size",
+                        type=int,
+                        default=DEFAULT_MAX_SIZE // (1024 * 1024),
+                        help="Maximum size of the validation result cache in MB.")
+    parser.add_argument("-w", "--watch",
+                        action="store_true",
+                        help="Keep running and revalidate the input directory whenever one of its files changes.")
+    parser.add_argument("--interval",
+                        type=float,
+                        default=0.5,
+                        help="Polling interval in seconds for --watch.")
+    parser.add_argument("--chunksize",
+                        type=int,
+                        default=None,
+                        help="Validate data files in chunks of this many rows to bound memory use.")
+    parser.add_argument("--max_examples",
+                        type=int,
+                        default=None,
+                        help="Maximum number of failure cases kept per column and check (default: 100); all failures are still counted.")
+    parser.add_argument("-s", "--stages",
+                        default=','.join(DEFAULT_STAGES),
+                        help=f"Comma-separated validation stages to run, out of {','.join(STAGES)}.")
 
     args = parser.parse_args()
-    
+
     # Set up a logger
     logging.basicConfig(level=logging.DEBUG)
 
-    validate_study(input_dir=args.input_dir)
+    cache = ResultCache(args.cache_dir, max_size=args.cache_size * 1024 * 1024) if args.cache_dir else None
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown_stages = set(stages) - set(STAGES)
+    if unknown_stages:
+        parser.error(f"Unknown stage(s): {', '.join(sorted(unknown_stages))}. Choose from {','.join(STAGES)}.")
+
+    if args.watch:
+        if not args.input_dir:
+            parser.error("--watch requires --input_dir.")
+        try:
+            watch_study(input_dir=args.input_dir, interval=args.interval, cache=cache, chunksize=args.chunksize,
+                        max_examples=args.max_examples, jobs=args.jobs)
+        except KeyboardInterrupt:
+            pass
+    elif args.root_dir:
+        validate_studies(root_dir=args.root_dir, jobs=args.jobs, cache=cache, stages=stages,
+                         chunksize=args.chunksize, max_examples=args.max_examples)
+    else:
+        print_summaries([validate_study_summary(input_dir=args.input_dir, cache=cache, stages=stages,
+                                                chunksize=args.chunksize, max_examples=args.max_examples, jobs=args.jobs)])